@@ -2,11 +2,1326 @@ import math
 import copy
 import time
 import argparse
+import random
+import multiprocessing
+import json
+import base64
+import sys
+import threading
+import atexit
+import cProfile
+import pstats
+import struct
+import io
+import mmap
+import bisect
+import array
+import itertools
+import os
+import gc
+from multiprocessing import shared_memory
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from string import whitespace
 from xml.etree.ElementTree import tostring
 
+#Side to move values used by the compact Position type
+WHITE = 0
+BLACK = 1
+
+#Piece codes stored in a Position board. The colour lives in bit 3 (0 = white, 8 = black) and the piece type in the low bits
+EMPTY = 0
+KING, QUEEN, BISHOP, KNIGHT, PAWN = 1, 2, 3, 4, 5
+COLOR_MASK = 8
+TYPE_MASK = 7
+PIECE_CODES = {".": EMPTY,
+               "wK": KING, "wQ": QUEEN, "wB": BISHOP, "wN": KNIGHT, "wp": PAWN,
+               "bK": KING | COLOR_MASK, "bQ": QUEEN | COLOR_MASK, "bB": BISHOP | COLOR_MASK,
+               "bN": KNIGHT | COLOR_MASK, "bp": PAWN | COLOR_MASK}
+PIECE_NAMES = [{code: name for name, code in PIECE_CODES.items()}.get(code, ".") for code in range(16)]
+
+#Chess notation of every square, indexed by row*5 + col: ("A", "5") for square 0
+SQUARE_NAMES = tuple((chr(ord("A") + sq % 5), str(5 - sq // 5)) for sq in range(25))
+#(row, col) of every square, indexed by row*5 + col
+SQUARE_COORDS = tuple(divmod(sq, 5) for sq in range(25))
+
+#Moves are encoded as a single int: start_square*25 + end_square, plus MOVE_PROMOTION when a pawn promotes.
+#The search only handles these ints, they are converted to board coordinates or chess terminology for the UI and the logs
+MOVE_PROMOTION = 1024
+MOVE_SQUARES = MOVE_PROMOTION - 1
+
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))  # top left, top right, bottom left, bottom right
+QUEEN_DIRECTIONS = BISHOP_DIRECTIONS + ((-1, 0), (1, 0), (0, -1), (0, 1))  # bishop directions + rook directions
+
+"""
+Builds the (row, col, square) targets reachable from every square with the given steps, in board-scan order
+"""
+def _leaper_targets(steps):
+    tables = []
+    for sq in range(25):
+        row, col = divmod(sq, 5)
+        targets = [(row + di, col + dj) for di, dj in steps if 0 <= row + di < 5 and 0 <= col + dj < 5]
+        tables.append(tuple((i, j, i * 5 + j) for i, j in sorted(targets)))
+    return tuple(tables)
+
+"""
+Builds the (row, col, target, is_capture) pawn targets of every square for a pawn moving by forward rows.
+target is the end square, with MOVE_PROMOTION added when the pawn reaches the last row
+"""
+def _pawn_targets(forward):
+    tables = []
+    for sq in range(25):
+        row, col = divmod(sq, 5)
+        i = row + forward
+        if not 0 <= i < 5:
+            tables.append(())
+            continue
+        promotion = MOVE_PROMOTION if i in (0, 4) else 0
+        tables.append(tuple((i, j, (i * 5 + j) + promotion, j != col) for j in (col - 1, col, col + 1) if 0 <= j < 5))
+    return tuple(tables)
+
+"""
+Builds the rays of every square for the given directions. Each ray is a tuple of (row, col, square) ordered away from the square
+"""
+def _ray_targets(directions):
+    tables = []
+    for sq in range(25):
+        row, col = divmod(sq, 5)
+        rays = []
+        for di, dj in directions:
+            ray = []
+            i, j = row + di, col + dj
+            while 0 <= i < 5 and 0 <= j < 5:
+                ray.append((i, j, i * 5 + j))
+                i += di
+                j += dj
+            if ray:
+                rays.append(tuple(ray))
+        tables.append(tuple(rays))
+    return tuple(tables)
+
+#Move tables computed once at import, indexed by the origin square row*5 + col
+KING_TARGETS = _leaper_targets(KING_STEPS)
+KNIGHT_TARGETS = _leaper_targets(KNIGHT_STEPS)
+WHITE_PAWN_TARGETS = _pawn_targets(-1)
+BLACK_PAWN_TARGETS = _pawn_targets(1)
+BISHOP_RAYS = _ray_targets(BISHOP_DIRECTIONS)
+QUEEN_RAYS = _ray_targets(QUEEN_DIRECTIONS)
+#ADJACENT[a][b] is 1 when the squares a and b touch (king distance 1), 0 otherwise
+ADJACENT = tuple(tuple(int(any(target == b for _, _, target in KING_TARGETS[a])) for b in range(25)) for a in range(25))
+
+class Position:
+    """
+    Compact position: a flat 25-cell bytearray of piece codes (square = row*5 + col, row 0 being rank 5)
+    and an int side to move (WHITE or BLACK).
+
+    Position is an interchange format, not the search representation: the search, move generation and evaluation
+    keep working on the game_state dictionary. Position is what Engine.search accepts from callers and what Bitboards
+    is built from.
+    """
+    __slots__ = ("board", "turn")
+
+    def __init__(self, board=None, turn=WHITE):
+        self.board = bytearray(25) if board is None else bytearray(board)
+        self.turn = turn
+
+    """
+    Builds a Position from the dictionary game_state used by MiniChess
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - Position | the equivalent compact position
+    """
+    @classmethod
+    def from_game_state(cls, game_state):
+        board = bytearray(PIECE_CODES[square] for row in game_state["board"] for square in row)
+        return cls(board, WHITE if game_state["turn"] == "white" else BLACK)
+
+    """
+    Converts the Position back into the dictionary game_state used by MiniChess (display_board, log_move, ...)
+
+    Args:
+        - None
+    Returns:
+        - game_state: dictionary | Dictionary representing the same game state
+    """
+    def to_game_state(self):
+        board = self.board
+        return {
+                "board": [[PIECE_NAMES[board[row * 5 + col]] for col in range(5)] for row in range(5)],
+                "turn": "white" if self.turn == WHITE else "black",
+                }
+
+    def copy(self):
+        return Position(self.board, self.turn)
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.board == other.board and self.turn == other.turn
+
+    def __repr__(self):
+        return "Position(%r, %s)" % (' '.join(PIECE_NAMES[code] for code in self.board),
+                                     "white" if self.turn == WHITE else "black")
+
+#Zobrist keys: one random 64-bit key per piece and square, XORed together with the side to move key into a position hash.
+#The seed is fixed so hashes are stable between runs
+_zobrist_random = random.Random(472)
+ZOBRIST_KEYS = {name: tuple(_zobrist_random.getrandbits(64) for _ in range(25)) for name in PIECE_CODES if name != "."}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+#Mixed into transposition table keys so scores of different heuristics never collide
+ZOBRIST_HEURISTIC = tuple(_zobrist_random.getrandbits(64) for _ in range(3))
+
+#Share of the user-entered timeout the AI spends searching, the rest is a safety margin for the move bookkeeping
+SEARCH_TIME_FRACTION = 0.9
+#Seconds of the timeout always kept as safety margin: with short timeouts the share above is smaller than the delays
+#the machine can add to a move
+SEARCH_TIME_MARGIN = 0.02
+#Share of the search time (AI_time_out) after which iterative deepening starts no new iteration: the next one would
+#not complete and be discarded. AI_time_out itself is the hard limit interrupting the running iteration
+SOFT_TIME_FRACTION = 0.5
+#Seconds between two reads of the clock by the search; the number of nodes between them follows the measured speed
+DEADLINE_CHECK_PERIOD = 0.001
+#Bounds of the number of nodes between two reads of the clock
+DEADLINE_CHECK_NODES = (4, 16384)
+#Deepest iteration of the alpha-beta iterative deepening unless a smaller depth is set
+MAX_SEARCH_DEPTH = 50
+#Turns without a capture after which the game is a draw
+DRAW_TURNS_WITHOUT_CAPTURE = 10
+#Search scores beyond this value mean a king capture was found, searching deeper cannot change the outcome
+KING_CAPTURE_SCORE = 500
+#Bound larger than any score, the full alpha-beta window is (-SEARCH_INFINITY, SEARCH_INFINITY)
+SEARCH_INFINITY = 15000
+#Width of the null window used by principal variation search, below the smallest heuristic step (0.1)
+PVS_WINDOW = 0.01
+#Half width of the aspiration window placed around the previous iteration's score
+ASPIRATION_WINDOW = 0.5
+
+#Piece values used by the heuristics and by move ordering
+PIECE_VALUES = {"K": 999, "Q": 9, "B": 3, "N": 3, "p": 1}
+#Piece values signed from white's point of view, summed into the running material balance game_state["material"]
+SIGNED_PIECE_VALUES = {name: (PIECE_VALUES[name[1]] if name[0] == "w" else -PIECE_VALUES[name[1]]) for name in PIECE_CODES if name != "."}
+#Index of a piece colour in the game_state["kings"] and game_state["safety"] lists
+COLOR_INDEX = {"w": 0, "b": 1}
+#Move ordering scores: hash/PV move, then captures (most valuable victim, least valuable attacker, so king captures lead),
+#then promotions, then killer moves, then the remaining quiet moves by history score
+ORDER_HASH_MOVE = 10000000
+ORDER_CAPTURE = 1000000
+ORDER_PROMOTION = 900000
+ORDER_KILLER = 800000
+
+#Transposition table bound types
+TT_EXACT = 0
+TT_LOWER = 1 # the stored score is a lower bound (the search failed high)
+TT_UPPER = 2 # the stored score is an upper bound (the search failed low)
+TT_ENTRY_BYTES = 160 # rough Python memory cost of one entry, used to size a table from a megabyte budget
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table indexed by the low bits of the position hash.
+    Each slot keeps one (depth, score, bound, best_move) entry with depth-preferred replacement.
+    """
+    __slots__ = ("size", "mask", "keys", "entries")
+
+    def __init__(self, entries=1 << 18, megabytes=None):
+        if megabytes is not None:
+            entries = int(megabytes * 1024 * 1024 // TT_ENTRY_BYTES)
+        size = 1
+        while size * 2 <= max(entries, 1):
+            size *= 2
+        self.size = size
+        self.mask = size - 1
+        self.keys = [None] * size
+        self.entries = [None] * size
+
+    """
+    Returns the (depth, score, bound, best_move) entry stored for the key, or None
+    """
+    def probe(self, key):
+        index = key & self.mask
+        if self.keys[index] == key:
+            return self.entries[index]
+        return None
+
+    """
+    Stores an entry for the key. A slot holding another position is only replaced by a search at least as deep
+    """
+    def store(self, key, depth, score, bound, best_move):
+        index = key & self.mask
+        old_key = self.keys[index]
+        if old_key is not None and old_key != key and self.entries[index][0] > depth:
+            return
+        self.keys[index] = key
+        self.entries[index] = (depth, score, bound, best_move)
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+
+class EvaluationCache:
+    """
+    Bounded cache of evaluate_board results, keyed by the position hash mixed with the heuristic id. When full, the
+    least recently used entry is evicted. Hits and misses are counted over the life of the cache.
+    """
+    __slots__ = ("size", "entries", "hits", "misses")
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    """
+    Returns the (game_end, score) stored for the key, or None
+    """
+    def probe(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, entry):
+        entries = self.entries
+        entries[key] = entry
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+#Shared transposition table layout: three unsigned 64-bit words per slot, [key ^ score ^ data, score, data], where score
+#holds the bits of the float score and data packs depth (16 bits), bound (2 bits), best move + 1 (12 bits) and a used bit
+TT_SHARED_ENTRY_WORDS = 3
+TT_SHARED_USED = 1 << 63
+_score_struct = struct.Struct("<d")
+_word_struct = struct.Struct("<Q")
+
+class SharedTranspositionTable:
+    """
+    Transposition table living in a multiprocessing.shared_memory block, so the processes of a Lazy SMP search read and
+    write the same entries. Slots are written without locks: the stored key is XORed with the two data words, so an
+    entry torn by a concurrent write fails the key check in probe and reads as a miss. Same interface as
+    TranspositionTable; pickling attaches to the same block instead of copying it.
+    """
+    __slots__ = ("size", "mask", "memory", "words", "owner")
+
+    def __init__(self, entries=1 << 18, megabytes=None, name=None):
+        if megabytes is not None:
+            entries = int(megabytes * 1024 * 1024 // (TT_SHARED_ENTRY_WORDS * 8))
+        size = 1
+        while size * 2 <= max(entries, 1):
+            size *= 2
+        self.size = size
+        self.mask = size - 1
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=size * TT_SHARED_ENTRY_WORDS * 8)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.words = self.memory.buf[:size * TT_SHARED_ENTRY_WORDS * 8].cast("Q")
+        if self.owner:
+            self.clear()
+
+    def __reduce__(self):
+        return (SharedTranspositionTable, (self.size, None, self.memory.name))
+
+    """
+    Returns the (depth, score, bound, best_move) entry stored for the key, or None
+    """
+    def probe(self, key):
+        index = (key & self.mask) * TT_SHARED_ENTRY_WORDS
+        words = self.words
+        check, score_bits, data = words[index], words[index + 1], words[index + 2]
+        if not data or check ^ score_bits ^ data != key:
+            return None
+        move = (data >> 18) & 0xFFF
+        return (data & 0xFFFF, _score_struct.unpack(_word_struct.pack(score_bits))[0], (data >> 16) & 3,
+                move - 1 if move else None)
+
+    """
+    Stores an entry for the key. A slot holding another position is only replaced by a search at least as deep
+    """
+    def store(self, key, depth, score, bound, best_move):
+        index = (key & self.mask) * TT_SHARED_ENTRY_WORDS
+        words = self.words
+        old_data = words[index + 2]
+        if old_data and words[index] ^ words[index + 1] ^ old_data != key and old_data & 0xFFFF > depth:
+            return
+        score_bits = _word_struct.unpack(_score_struct.pack(score))[0]
+        data = TT_SHARED_USED | (0 if best_move is None else best_move + 1) << 18 | bound << 16 | depth
+        words[index + 1] = score_bits
+        words[index + 2] = data
+        words[index] = key ^ score_bits ^ data
+
+    def clear(self):
+        self.memory.buf[:len(self.words) * 8] = bytes(len(self.words) * 8)
+
+    """
+    Detaches this process from the shared block, and frees it when this instance created it. Closing twice is harmless
+    """
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+            self.owner = False
+
+#Opening book file layout: a header (magic, algorithm the entries were searched with, number of entries) followed by
+#the entries sorted by key, each entry being the position key (hash ^ ZOBRIST_HEURISTIC[heuristic]), the encoded best
+#move and its negamax score as a double, so scores read back exactly as the search returned them
+BOOK_MAGIC = b"MCB2"
+BOOK_ALGORITHMS = ("minimax", "alpha-beta") # indexed by the algorithm byte of the header
+_book_header_struct = struct.Struct("<4sBI")
+_book_entry_struct = struct.Struct("<QHd")
+
+class OpeningBook:
+    """
+    Read-only opening book memory-mapped from a file written by build_opening_book. Lookups are binary searches over
+    the sorted keys of the mapped file, nothing is loaded up front. algorithm names the search the entries come from.
+    """
+    __slots__ = ("file", "data", "algorithm", "count", "keys")
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, algorithm, self.count = _book_header_struct.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or algorithm >= len(BOOK_ALGORITHMS):
+            self.close()
+            raise ValueError(f"{filename} is not an opening book of this version")
+        self.algorithm = BOOK_ALGORITHMS[algorithm]
+        self.keys = _BookKeys(self.data, self.count)
+
+    """
+    Returns the (best_move, score) entry stored for the key, or None
+    """
+    def probe(self, key):
+        index = bisect.bisect_left(self.keys, key)
+        if index == self.count or self.keys[index] != key:
+            return None
+        _, move, score = _book_entry_struct.unpack_from(self.data, _book_header_struct.size + index * _book_entry_struct.size)
+        return move, score
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    """
+    Writes a book file from (key, best_move, score) entries
+
+    Args:
+        - filename: string | the file to write
+        - entries: iterable | (key, encoded move, negamax score) tuples, keys must be unique
+        - algorithm: string | "alpha-beta" or "minimax", the search the entries come from
+    Returns:
+        - None
+    """
+    @staticmethod
+    def write(filename, entries, algorithm="alpha-beta"):
+        entries = sorted(entries)
+        with open(filename, "wb") as file:
+            file.write(_book_header_struct.pack(BOOK_MAGIC, BOOK_ALGORITHMS.index(algorithm), len(entries)))
+            for key, move, score in entries:
+                file.write(_book_entry_struct.pack(key, move, score))
+
+class _BookKeys:
+    """
+    Sequence view of the keys of a mapped opening book, so bisect can search them in place
+    """
+    __slots__ = ("data", "count")
+
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return _word_struct.unpack_from(self.data, _book_header_struct.size + index * _book_entry_struct.size)[0]
+
+#Bitboards: bit sq of a 25-bit int stands for the square sq = row*5 + col
+KING_MASKS = tuple(sum(1 << (i * 5 + j) for i, j, _ in targets) for targets in KING_TARGETS)
+KNIGHT_MASKS = tuple(sum(1 << (i * 5 + j) for i, j, _ in targets) for targets in KNIGHT_TARGETS)
+WHITE_PAWN_PUSH_MASKS = tuple(sum(1 << (i * 5 + j) for i, j, _, capture in targets if not capture) for targets in WHITE_PAWN_TARGETS)
+WHITE_PAWN_ATTACK_MASKS = tuple(sum(1 << (i * 5 + j) for i, j, _, capture in targets if capture) for targets in WHITE_PAWN_TARGETS)
+BLACK_PAWN_PUSH_MASKS = tuple(sum(1 << (i * 5 + j) for i, j, _, capture in targets if not capture) for targets in BLACK_PAWN_TARGETS)
+BLACK_PAWN_ATTACK_MASKS = tuple(sum(1 << (i * 5 + j) for i, j, _, capture in targets if capture) for targets in BLACK_PAWN_TARGETS)
+PAWN_PUSH_MASKS = (WHITE_PAWN_PUSH_MASKS, BLACK_PAWN_PUSH_MASKS)
+PAWN_ATTACK_MASKS = (WHITE_PAWN_ATTACK_MASKS, BLACK_PAWN_ATTACK_MASKS)
+PROMOTION_ROW_MASKS = (0b11111, 0b11111 << 20) # rows where white and black pawns promote
+
+#RAY_MASKS[sq][d] holds every square from sq (excluded) to the edge of the board in QUEEN_DIRECTIONS[d].
+#RAY_POSITIVE[d] tells whether that direction runs towards higher square indices, which decides whether
+#the first blocker on a ray is its lowest or its highest set bit
+RAY_MASKS = tuple(
+    tuple(sum(1 << ((sq // 5 + di * k) * 5 + sq % 5 + dj * k) for k in range(1, 5)
+              if 0 <= sq // 5 + di * k < 5 and 0 <= sq % 5 + dj * k < 5)
+          for di, dj in QUEEN_DIRECTIONS)
+    for sq in range(25))
+RAY_POSITIVE = tuple(di * 5 + dj > 0 for di, dj in QUEEN_DIRECTIONS)
+BISHOP_DIRECTION_INDICES = (0, 1, 2, 3)
+QUEEN_DIRECTION_INDICES = (0, 1, 2, 3, 4, 5, 6, 7)
+
+#Reference perft counts of the initial board, see MiniChess.perft (a king capture ends the game)
+PERFT_REFERENCE = {1: 13, 2: 170, 3: 2452, 4: 34813, 5: 532546, 6: 8082547}
+
+"""
+Returns the squares attacked by a bishop or queen on sq, stopping each ray at its first blocker (included)
+
+Args:
+    - sq: int | square of the sliding piece
+    - occupied: int | bitboard of every occupied square
+    - directions: tuple | indices into QUEEN_DIRECTIONS to slide along
+Returns:
+    - int | bitboard of the attacked squares
+"""
+def slider_attacks(sq, occupied, directions):
+    attacks = 0
+    rays = RAY_MASKS[sq]
+    for d in directions:
+        ray = rays[d]
+        blockers = ray & occupied
+        if blockers:
+            if RAY_POSITIVE[d]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAY_MASKS[first][d]  # drop the squares behind the blocker
+        attacks |= ray
+    return attacks
+
+"""
+Precomputes the attacks of a slider on sq along the given directions for every set of blockers on those rays
+
+Args:
+    - sq: int | square of the sliding piece
+    - directions: tuple | indices into QUEEN_DIRECTIONS to slide along
+Returns:
+    - tuple | (bitboard of the ray squares, dictionary from the blockers on the rays to the attacked squares)
+"""
+def _slider_table(sq, directions):
+    mask = 0
+    for d in directions:
+        mask |= RAY_MASKS[sq][d]
+    table = {}
+    blockers = 0
+    while True: # every subset of mask
+        table[blockers] = slider_attacks(sq, blockers, directions)
+        blockers = (blockers - mask) & mask
+        if not blockers:
+            return mask, table
+
+#Slider attacks looked up instead of walked: per square, the diagonal (bishop) and orthogonal ray squares and the
+#attacks for every set of blockers on them. A queen attacks the union of both
+DIAGONAL_ATTACKS = tuple(_slider_table(sq, BISHOP_DIRECTION_INDICES) for sq in range(25))
+ORTHOGONAL_ATTACKS = tuple(_slider_table(sq, QUEEN_DIRECTION_INDICES[4:]) for sq in range(25))
+
+"""
+Returns the squares attacked by a bishop on sq, the first blocker of each ray included
+"""
+def bishop_attacks(sq, occupied):
+    mask, table = DIAGONAL_ATTACKS[sq]
+    return table[occupied & mask]
+
+"""
+Returns the squares attacked by a queen on sq, the first blocker of each ray included
+"""
+def queen_attacks(sq, occupied):
+    mask, table = DIAGONAL_ATTACKS[sq]
+    orthogonal_mask, orthogonal_table = ORTHOGONAL_ATTACKS[sq]
+    return table[occupied & mask] | orthogonal_table[occupied & orthogonal_mask]
+
+"""
+Iterates over the squares set in a bitboard, lowest square first
+"""
+def iterate_bits(bitboard):
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+class Bitboards:
+    """
+    Bitboard view of a Position: one 25-bit int per piece code, per colour and for the whole board.
+    Move generation, attack detection and mobility counting are plain int set operations. With
+    move_generator = "bitboard", refresh_game_state keeps one in game_state["bitboards"], updated by
+    simulate_make_move/simulate_unmake_move through toggle_move instead of being rebuilt for every call.
+    """
+    __slots__ = ("pieces", "colors", "occupied", "turn")
+
+    def __init__(self, position):
+        pieces = [0] * 16
+        for sq, code in enumerate(position.board):
+            if code:
+                pieces[code] |= 1 << sq
+        self.pieces = pieces
+        self.colors = [pieces[KING] | pieces[QUEEN] | pieces[BISHOP] | pieces[KNIGHT] | pieces[PAWN],
+                       pieces[KING | COLOR_MASK] | pieces[QUEEN | COLOR_MASK] | pieces[BISHOP | COLOR_MASK]
+                       | pieces[KNIGHT | COLOR_MASK] | pieces[PAWN | COLOR_MASK]]
+        self.occupied = self.colors[WHITE] | self.colors[BLACK]
+        self.turn = position.turn
+
+    """
+    Plays or takes back a move (every update is an XOR, so the same call undoes it) and flips the side to move
+
+    Args:
+        - start: int | origin square
+        - end: int | destination square
+        - piece: int | code of the moving piece
+        - placed: int | code of the piece standing on end after the move (differs from piece for a promotion)
+        - captured: int | code of the captured piece, EMPTY when none
+    Returns:
+        - None
+    """
+    def toggle_move(self, start, end, piece, placed, captured):
+        pieces = self.pieces
+        colors = self.colors
+        start_bit = 1 << start
+        end_bit = 1 << end
+        color = BLACK if piece & COLOR_MASK else WHITE
+        pieces[piece] ^= start_bit
+        pieces[placed] ^= end_bit
+        colors[color] ^= start_bit | end_bit
+        if captured:
+            pieces[captured] ^= end_bit
+            colors[color ^ 1] ^= end_bit
+        self.occupied = colors[WHITE] | colors[BLACK]
+        self.turn ^= 1
+
+    """
+    Returns the target squares of every piece of the given colour, as (from_square, targets_bitboard) pairs
+
+    Args:
+        - color: int | WHITE or BLACK
+    Returns:
+        - list of (int, int) | the origin square and the bitboard of its reachable squares
+    """
+    def targets(self, color):
+        pieces = self.pieces
+        occupied = self.occupied
+        own = self.colors[color]
+        enemy = self.colors[color ^ 1]
+        base = COLOR_MASK if color == BLACK else 0
+        result = []
+        for sq in iterate_bits(pieces[base | KING]):
+            result.append((sq, KING_MASKS[sq] & ~own))
+        for sq in iterate_bits(pieces[base | QUEEN]):
+            result.append((sq, queen_attacks(sq, occupied) & ~own))
+        for sq in iterate_bits(pieces[base | BISHOP]):
+            result.append((sq, bishop_attacks(sq, occupied) & ~own))
+        for sq in iterate_bits(pieces[base | KNIGHT]):
+            result.append((sq, KNIGHT_MASKS[sq] & ~own))
+        push_masks = PAWN_PUSH_MASKS[color]
+        attack_masks = PAWN_ATTACK_MASKS[color]
+        for sq in iterate_bits(pieces[base | PAWN]):
+            result.append((sq, (push_masks[sq] & ~occupied) | (attack_masks[sq] & enemy)))
+        return result
+
+    """
+    Returns the list of valid moves of the side to move, encoded like MiniChess.generate_moves
+    """
+    def moves(self):
+        color = self.turn
+        pawns = self.pieces[PAWN | (COLOR_MASK if color == BLACK else 0)]
+        last_row = PROMOTION_ROW_MASKS[color]
+        moves = []
+        for sq, targets in self.targets(color):
+            base = sq * 25
+            if (pawns >> sq) & 1 and targets & last_row:
+                base += MOVE_PROMOTION  # every target of a pawn lies on the same row
+            for to in iterate_bits(targets):
+                moves.append(base + to)
+        return moves
+
+    """
+    Returns the number of valid moves of the given colour without building the move list
+    """
+    def mobility(self, color):
+        pieces = self.pieces
+        occupied = self.occupied
+        free = ~self.colors[color]
+        base = COLOR_MASK if color == BLACK else 0
+        count = 0
+        for sq in iterate_bits(pieces[base | KING]):
+            count += (KING_MASKS[sq] & free).bit_count()
+        for sq in iterate_bits(pieces[base | QUEEN]):
+            count += (queen_attacks(sq, occupied) & free).bit_count()
+        for sq in iterate_bits(pieces[base | BISHOP]):
+            count += (bishop_attacks(sq, occupied) & free).bit_count()
+        for sq in iterate_bits(pieces[base | KNIGHT]):
+            count += (KNIGHT_MASKS[sq] & free).bit_count()
+        push_masks = PAWN_PUSH_MASKS[color]
+        attack_masks = PAWN_ATTACK_MASKS[color]
+        enemy = self.colors[color ^ 1]
+        for sq in iterate_bits(pieces[base | PAWN]):
+            count += ((push_masks[sq] & ~occupied) | (attack_masks[sq] & enemy)).bit_count()
+        return count
+
+    """
+    Returns the bitboard of every square attacked by the given colour (pawns attack diagonally forward only)
+    """
+    def attacked_squares(self, color):
+        pieces = self.pieces
+        occupied = self.occupied
+        base = COLOR_MASK if color == BLACK else 0
+        attacks = 0
+        for sq in iterate_bits(pieces[base | KING]):
+            attacks |= KING_MASKS[sq]
+        for sq in iterate_bits(pieces[base | QUEEN]):
+            attacks |= queen_attacks(sq, occupied)
+        for sq in iterate_bits(pieces[base | BISHOP]):
+            attacks |= bishop_attacks(sq, occupied)
+        for sq in iterate_bits(pieces[base | KNIGHT]):
+            attacks |= KNIGHT_MASKS[sq]
+        attack_masks = PAWN_ATTACK_MASKS[color]
+        for sq in iterate_bits(pieces[base | PAWN]):
+            attacks |= attack_masks[sq]
+        return attacks
+
+    """
+    Returns True when the king of the given colour stands on a square attacked by the opponent
+    """
+    def king_attacked(self, color):
+        king = self.pieces[KING | (COLOR_MASK if color == BLACK else 0)]
+        return bool(king & self.attacked_squares(color ^ 1))
+
+#Endgame tablebases: positions with at most TABLEBASE_MAX_PIECES pieces are looked up by alpha_beta instead of searched.
+#A table stores one signed 16-bit value per position of a material signature: +d when the player to move captures the
+#king or converts (captures a piece into a won ending) in d plies, -d when the opponent does, 0 for a draw
+TABLEBASE_MAX_PIECES = 4
+#Score of a tablebase win converted in 0 plies, above KING_CAPTURE_SCORE so the search stops deepening
+TABLEBASE_WIN_SCORE = 900
+TABLEBASE_MAGIC = b"MCT1"
+TABLEBASE_LETTERS = {KING: "K", QUEEN: "Q", BISHOP: "B", KNIGHT: "N", PAWN: "P"}
+#Plies before the no-capture draw rule ends the game, right after a capture by white (black to move) or by black
+FRESH_DRAW_BUDGET = (2 * DRAW_TURNS_WITHOUT_CAPTURE - 2, 2 * DRAW_TURNS_WITHOUT_CAPTURE - 1)
+
+"""
+Time the AI searches for a move: SEARCH_TIME_FRACTION of the user-entered timeout, leaving at least SEARCH_TIME_MARGIN
+seconds for the move bookkeeping, but never less than half of the timeout
+
+Args:
+    - timeout: float | seconds allowed per move
+Returns:
+    - float | seconds for AI_time_out
+"""
+def search_time_budget(timeout):
+    return max(min(timeout * SEARCH_TIME_FRACTION, timeout - SEARCH_TIME_MARGIN), timeout / 2)
+
+"""
+Number of plies that can still be played before check_draw ends the game
+
+Args:
+    - turn_counter: int | the current turn
+    - turn_with_piece_taken: int | the last turn a piece was taken
+    - turn: int | WHITE or BLACK, the player to move
+Returns:
+    - int | plies left, the move that ends the game by capturing a king included
+"""
+def draw_budget(turn_counter, turn_with_piece_taken, turn):
+    return 2 * (DRAW_TURNS_WITHOUT_CAPTURE - (turn_counter - turn_with_piece_taken)) - (1 if turn == BLACK else 0)
+
+"""
+Name of a material signature, white pieces then black pieces, e.g. "KQvK"
+
+Args:
+    - codes: list | sorted piece codes of the signature
+Returns:
+    - string | the signature name, also the name of its tablebase file
+"""
+def tablebase_name(codes):
+    white = ''.join(TABLEBASE_LETTERS[code] for code in codes if not code & COLOR_MASK)
+    black = ''.join(TABLEBASE_LETTERS[code & TYPE_MASK] for code in codes if code & COLOR_MASK)
+    return white + "v" + black
+
+"""
+Parses a signature name such as "KBNvK" into its sorted piece codes
+"""
+def tablebase_codes(name):
+    white, black = name.upper().split("V")
+    letters = {letter: code for code, letter in TABLEBASE_LETTERS.items()}
+    codes = sorted([letters[letter] for letter in white] + [letters[letter] | COLOR_MASK for letter in black])
+    if codes.count(KING) != 1 or codes.count(KING | COLOR_MASK) != 1:
+        raise ValueError(f"a signature needs one king per side: {name}")
+    if len(codes) > TABLEBASE_MAX_PIECES:
+        raise ValueError(f"at most {TABLEBASE_MAX_PIECES} pieces per signature: {name}")
+    return codes
+
+"""
+Index of a position in the table of its signature: turn + 2 * (square of piece 0 + 25 * square of piece 1 + ...)
+"""
+def tablebase_index(squares, turn):
+    index = 0
+    for sq in reversed(squares):
+        index = index * 25 + sq
+    return index * 2 + turn
+
+class Tablebases:
+    """
+    Endgame tablebases read from the files written by generate_tablebases, one file per material signature in a
+    directory. Tables are loaded on first use; a signature without a file is remembered as missing.
+    """
+    __slots__ = ("directory", "tables")
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}
+
+    """
+    Returns the table of a signature, or None when it was not generated
+    """
+    def table(self, codes):
+        name = tablebase_name(codes)
+        if name not in self.tables:
+            try:
+                with open(os.path.join(self.directory, name + ".mtb"), "rb") as file:
+                    if file.read(len(TABLEBASE_MAGIC)) != TABLEBASE_MAGIC:
+                        raise ValueError(f"{file.name} is not a tablebase")
+                    table = array.array("h")
+                    table.frombytes(file.read())
+            except FileNotFoundError:
+                table = None
+            self.tables[name] = table
+        return self.tables[name]
+
+    """
+    Returns the stored value of a position, or None when its signature has no table
+
+    Args:
+        - pieces: list | (piece code, square) pairs of every piece on the board
+        - turn: int | WHITE or BLACK, the player to move
+    Returns:
+        - int | +d win in d plies, -d loss in d plies, 0 draw (point of view of the player to move)
+    """
+    def lookup(self, pieces, turn):
+        pieces = sorted(pieces)
+        table = self.table([code for code, _ in pieces])
+        if table is None:
+            return None
+        return table[tablebase_index([sq for _, sq in pieces], turn)]
+
+    """
+    Scores a position for the search. A win or loss only counts when it is converted before the no-capture draw rule
+    ends the game; the search only knows bounds of the plies left when a capture happened since the root, so a result
+    falling between them is not answered.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - min_budget: int | fewest plies possibly left before the draw rule
+        - max_budget: int | most plies possibly left before the draw rule
+    Returns:
+        - float | negamax score of the position, or None when it cannot be answered
+    """
+    def probe(self, game_state, min_budget, max_budget):
+        pieces = [(PIECE_CODES[square], row_index * 5 + col_index)
+                  for row_index, row in enumerate(game_state["board"])
+                  for col_index, square in enumerate(row) if square != "."]
+        value = self.lookup(pieces, WHITE if game_state["turn"] == "white" else BLACK)
+        if value is None:
+            return None
+        if value == 0 or abs(value) > max_budget:
+            return 0
+        if abs(value) > min_budget:
+            return None
+        return TABLEBASE_WIN_SCORE - value if value > 0 else -TABLEBASE_WIN_SCORE - value
+
+"""
+Generates the tablebases of the given signatures into a directory, along with every smaller signature they convert
+into (captures and promotions), skipping signatures whose file already exists
+
+Args:
+    - directory: string | directory receiving one NAME.mtb file per signature
+    - names: list | signature names such as "KQvK"
+Returns:
+    - list | names of the signatures generated
+"""
+def generate_tablebases(directory, names):
+    os.makedirs(directory, exist_ok=True)
+    tablebases = Tablebases(directory)
+    generated = []
+    def generate(codes):
+        if tablebases.table(codes) is not None:
+            return
+        for index, code in enumerate(codes):
+            if code & TYPE_MASK != KING:
+                generate(sorted(codes[:index] + codes[index + 1:]))
+            if code & TYPE_MASK == PAWN:
+                generate(sorted(codes[:index] + [(code & COLOR_MASK) | QUEEN] + codes[index + 1:]))
+        table = solve_tablebase(codes, tablebases)
+        name = tablebase_name(codes)
+        with open(os.path.join(directory, name + ".mtb"), "wb") as file:
+            file.write(TABLEBASE_MAGIC)
+            file.write(table.tobytes())
+        tablebases.tables[name] = table
+        generated.append(name)
+    for name in names:
+        generate(tablebase_codes(name))
+    return generated
+
+"""
+Solves one material signature by retrograde analysis. Every position is first scored from the moves that leave the
+signature (king captures, captures and promotions, looked up in the smaller tables), then wins and losses are
+propagated backwards through un-moves in order of distance: a position is won in d + 1 plies if one move reaches a
+position lost in d, lost in the largest such distance + 1 once every move reaches a won position. Positions never
+reached this way are draws, as are positions without moves. Distances count plies since the last capture, so a
+capture into a smaller ending counts as 1 ply and that ending's result as of a fresh draw counter.
+
+Args:
+    - codes: list | sorted piece codes of the signature
+    - tablebases: Tablebases | tables of the signatures it converts into
+Returns:
+    - array | the signed value of every index (see tablebase_index), 0 for impossible placements
+"""
+def solve_tablebase(codes, tablebases):
+    count = len(codes)
+    size = 2 * 25 ** count
+    values = array.array("h", bytes(2 * size))
+    remaining = array.array("B", bytes(size)) # moves not known to lose yet
+    escapes = bytearray(size) # a move reaches a draw, the position cannot be lost
+    longest_loss = array.array("h", bytes(2 * size))
+    buckets = {} # distance -> [(index, won)]
+
+    def push(distance, index, won):
+        buckets.setdefault(distance, []).append((index, won))
+
+    valid = {}
+    for squares in itertools.product(range(25), repeat=count):
+        if len(set(squares)) < count or any(
+                codes[i] == PAWN and squares[i] < 5 or codes[i] == PAWN | COLOR_MASK and squares[i] >= 20
+                for i in range(count)):
+            continue
+        for turn in (WHITE, BLACK):
+            index = tablebase_index(squares, turn)
+            valid[index] = (squares, turn)
+            best_win = None
+            for piece, start, end, captured, promoted in tablebase_moves(codes, squares, turn):
+                if captured is None and not promoted:
+                    remaining[index] += 1
+                    continue
+                if captured is not None and codes[captured] & TYPE_MASK == KING:
+                    best_win = 1
+                    continue
+                #Move leaving the signature: look the reached position up, as the player who moves next
+                child = [(codes[i], end if i == piece else squares[i]) for i in range(count) if i != captured]
+                if promoted:
+                    child[piece if captured is None or piece < captured else piece - 1] = (codes[piece] & COLOR_MASK | QUEEN, end)
+                value = tablebases.lookup(child, turn ^ 1)
+                if captured is not None:
+                    #A capture resets the draw counter: the reached ending starts with a fresh one
+                    distance = 1 if value and abs(value) <= FRESH_DRAW_BUDGET[turn ^ 1] else 0
+                else:
+                    distance = abs(value) + 1 if value else 0
+                if not distance:
+                    escapes[index] = 1
+                elif value < 0:
+                    best_win = distance if best_win is None else min(best_win, distance)
+                else:
+                    longest_loss[index] = max(longest_loss[index], distance)
+            if best_win is not None:
+                push(best_win, index, True)
+            elif not remaining[index] and not escapes[index] and longest_loss[index]:
+                push(longest_loss[index], index, False)
+
+    distance = 1
+    while buckets:
+        for index, won in buckets.pop(distance, ()):
+            if values[index]:
+                continue
+            values[index] = distance if won else -distance
+            squares, turn = valid[index]
+            for parent in tablebase_unmoves(codes, squares, turn):
+                if values[parent]:
+                    continue
+                if not won:
+                    push(distance + 1, parent, True)
+                else:
+                    remaining[parent] -= 1
+                    longest_loss[parent] = max(longest_loss[parent], distance + 1)
+                    if not remaining[parent] and not escapes[parent]:
+                        push(longest_loss[parent], parent, False)
+        distance += 1
+    return values
+
+"""
+Moves of the player to move in a tablebase position, described by piece indices
+
+Args:
+    - codes: list | piece codes of the signature
+    - squares: tuple | square of every piece
+    - turn: int | WHITE or BLACK, the player to move
+Returns:
+    - generator | (moving piece index, start square, end square, captured piece index or None, promotion) tuples
+"""
+def tablebase_moves(codes, squares, turn):
+    owners = {sq: i for i, sq in enumerate(squares)}
+    occupied = 0
+    own = 0
+    for i, sq in enumerate(squares):
+        occupied |= 1 << sq
+        if (codes[i] & COLOR_MASK) == (COLOR_MASK if turn == BLACK else 0):
+            own |= 1 << sq
+    enemy = occupied & ~own
+    for i, sq in enumerate(squares):
+        if not own >> sq & 1:
+            continue
+        kind = codes[i] & TYPE_MASK
+        if kind == KING:
+            targets = KING_MASKS[sq] & ~own
+        elif kind == QUEEN:
+            targets = queen_attacks(sq, occupied) & ~own
+        elif kind == BISHOP:
+            targets = bishop_attacks(sq, occupied) & ~own
+        elif kind == KNIGHT:
+            targets = KNIGHT_MASKS[sq] & ~own
+        else:
+            targets = (PAWN_PUSH_MASKS[turn][sq] & ~occupied) | (PAWN_ATTACK_MASKS[turn][sq] & enemy)
+        promoted = kind == PAWN and bool(targets & PROMOTION_ROW_MASKS[turn])
+        for end in iterate_bits(targets):
+            yield i, sq, end, owners.get(end), promoted
+
+"""
+Indices of the positions of the same signature from which a quiet move (no capture, no promotion) of the opponent of
+the player to move reaches the given position
+
+Args:
+    - codes: list | piece codes of the signature
+    - squares: tuple | square of every piece
+    - turn: int | WHITE or BLACK, the player to move
+Returns:
+    - generator | indices of the predecessor positions (the opponent to move)
+"""
+def tablebase_unmoves(codes, squares, turn):
+    mover = turn ^ 1
+    occupied = 0
+    for sq in squares:
+        occupied |= 1 << sq
+    squares = list(squares)
+    for i, sq in enumerate(squares):
+        code = codes[i]
+        if (code & COLOR_MASK) != (COLOR_MASK if mover == BLACK else 0):
+            continue
+        kind = code & TYPE_MASK
+        if kind == KING:
+            origins = KING_MASKS[sq]
+        elif kind == QUEEN:
+            origins = queen_attacks(sq, occupied)
+        elif kind == BISHOP:
+            origins = bishop_attacks(sq, occupied)
+        elif kind == KNIGHT:
+            origins = KNIGHT_MASKS[sq]
+        else:
+            origin = sq + 5 if mover == WHITE else sq - 5 # pawns only push forward one square
+            origins = 1 << origin if 0 <= origin < 25 else 0
+        for start in iterate_bits(origins & ~occupied):
+            squares[i] = start
+            yield tablebase_index(squares, mover)
+        squares[i] = sq
+
+"""
+Per-process state of the root-split search workers: the engine searching the root moves (its transposition table,
+killers and history persist between tasks) and the best root score shared by every worker of the pool
+"""
+_worker_engine = None
+_worker_bound = None
+
+"""
+Initializer of the root-split worker processes
+
+Args:
+    - shared_bound: multiprocessing.Value | best root score found so far by any worker (point of view of the root)
+Returns:
+    - None
+"""
+def init_search_worker(shared_bound):
+    global _worker_engine, _worker_bound
+    _worker_engine = MiniChess()
+    _worker_bound = shared_bound
+
+"""
+Searches one root move in a worker process. alpha-beta starts from the best root score published by the other
+workers (null window first, like the PVS of alpha_beta) and publishes its own score when it is better; minimax
+searches the full subtree.
+
+Args:
+    - game_state: dictionary | Dictionary representing the root game state
+    - move: int | the encoded root move to search
+    - depth: int | depth of the root search
+    - beta: float | upper bound of the root window
+    - deadline: float | time.time() at which the search must stop
+    - settings: dictionary | engine attributes copied from the parent (algorithm, heuristic, ...)
+Returns:
+    - tuple | (value, searched alpha, nodes explored, depth_exploration_stats, timed out)
+"""
+def search_root_move(game_state, move, depth, beta, deadline, settings):
+    engine = _worker_engine
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    engine.total_states_explored = 0
+    engine.depth_exploration_stats = {}
+    engine.search_timed_out = False
+    engine.AI_Start_Time = time.perf_counter()
+    engine.AI_time_out = deadline - time.time()
+    engine.reset_deadline()
+    engine.refresh_game_state(game_state)
+    game_state = engine.simulate_make_move(game_state, move)[2]
+    alpha = _worker_bound.value
+    if not engine.algorithm:
+        value = -engine.minimax(game_state, depth - 1, 1)[1]
+    else:
+        value = -engine.alpha_beta(game_state, depth - 1, -alpha - PVS_WINDOW, -alpha, 1)[1]
+        if alpha < value < beta and not engine.search_timed_out:
+            value = -engine.alpha_beta(game_state, depth - 1, -beta, -alpha, 1)[1]
+    if not engine.search_timed_out:
+        with _worker_bound.get_lock():
+            if value > _worker_bound.value:
+                _worker_bound.value = value
+    return value, alpha, engine.total_states_explored, engine.depth_exploration_stats, engine.search_timed_out
+
+"""
+Per-process state of the Lazy SMP helpers: the helper engine, searching with the shared transposition table, and the
+flag the main search raises to stop the helpers
+"""
+_helper_engine = None
+
+"""
+Initializer of the Lazy SMP helper processes
+
+Args:
+    - table: SharedTranspositionTable | transposition table shared with the main search
+    - stop_flag: multiprocessing.RawValue | set to 1 by the main search when it has its move
+Returns:
+    - None
+"""
+def init_smp_helper(table, stop_flag):
+    global _helper_engine
+    _helper_engine = MiniChess()
+    _helper_engine.transposition_table = table
+    _helper_engine.stop_flag = stop_flag
+
+"""
+Runs one Lazy SMP helper: iterative deepening of the same root as the main search, filling the shared transposition
+table. Odd helpers search one ply deeper than the main search and each helper starts from its own random history
+scores, so helpers explore the tree in different orders instead of duplicating the main search.
+
+Args:
+    - game_state: dictionary | Dictionary representing the root game state
+    - helper: int | index of the helper, 1 to number of helpers
+    - deadline: float | time.time() at which the search must stop
+    - settings: dictionary | engine attributes copied from the main engine (heuristic, max_depth, ...)
+Returns:
+    - tuple | (nodes explored, depth_exploration_stats, deepest completed depth)
+"""
+def smp_helper_search(game_state, helper, deadline, settings):
+    engine = _helper_engine
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    engine.total_states_explored = 0
+    engine.depth_exploration_stats = {}
+    ordering = random.Random(helper)
+    engine.history = {key: ordering.randrange(64) for key in ((piece, end) for piece in PIECE_CODES if piece != "."
+                                                              for end in range(25))}
+    engine.AI_Start_Time = time.perf_counter()
+    engine.AI_time_out = deadline - time.time()
+    engine.refresh_game_state(game_state)
+    engine.iterative_deepening(game_state, helper % 2)
+    return engine.total_states_explored, engine.depth_exploration_stats, engine.completed_depth
+
+#MiniChess methods timed by the Profiler
+PROFILED_FUNCTIONS = ("AI_makeMove", "iterative_deepening", "alpha_beta", "quiescence", "minimax", "order_moves",
+                      "generate_moves", "valid_moves", "tactical_moves", "king_valid_moves", "knight_valid_moves",
+                      "white_pawn_valid_moves", "black_pawn_valid_moves", "bishop_valid_moves", "queen_valid_moves",
+                      "evaluate_board", "count_mobility", "simulate_make_move", "simulate_unmake_move", "is_valid_move",
+                      "parse_input", "parse_input_v2", "unparse_input", "log_move", "display_board")
+
+class Profiler:
+    """
+    Opt-in profiling of a MiniChess instance, used as a context manager around an AI_makeMove call or a whole game.
+    While active, the methods of PROFILED_FUNCTIONS are shadowed on the instance by wrappers counting their calls,
+    their time (callees included, outermost calls only) and their own time (profiled callees excluded); leaving the
+    context removes the wrappers, so the instance runs unchanged when it is not profiled. With a cprofile_file, the
+    same span is also recorded by cProfile and dumped in pstats format.
+    """
+
+    def __init__(self, engine, functions=PROFILED_FUNCTIONS, cprofile_file=None):
+        self.engine = engine
+        self.functions = functions
+        self.cprofile_file = cprofile_file
+        self.cprofile = None
+        self.calls = dict.fromkeys(functions, 0)
+        self.total = dict.fromkeys(functions, 0.0)
+        self.own = dict.fromkeys(functions, 0.0)
+        self.active = dict.fromkeys(functions, 0) # recursion depth of each function
+        self.callees = [] # time spent in profiled callees, per active call
+        self.elapsed = 0.0
+        self.start = 0.0
+
+    """
+    Returns a wrapper of a bound method recording its calls and times
+    """
+    def wrap(self, name, method):
+        calls, total, own, active, callees = self.calls, self.total, self.own, self.active, self.callees
+        perf_counter = time.perf_counter
+        def timed(*args, **kwargs):
+            callees.append(0.0)
+            active[name] += 1
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                active[name] -= 1
+                calls[name] += 1
+                own[name] += elapsed - callees.pop()
+                if not active[name]:
+                    total[name] += elapsed
+                if callees:
+                    callees[-1] += elapsed
+        return timed
+
+    def __enter__(self):
+        for name in self.functions:
+            setattr(self.engine, name, self.wrap(name, getattr(self.engine, name)))
+        if self.cprofile_file is not None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed += time.perf_counter() - self.start
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_file)
+        for name in self.functions:
+            delattr(self.engine, name)
+        return False
+
+    """
+    Returns the ranked hot-path report: profiled functions by decreasing own time
+
+    Args:
+        - limit: int | number of functions listed
+    Returns:
+        - string | the report, one line per function
+    """
+    def report(self, limit=20):
+        lines = [f"Profiled {self.elapsed:.3f} s", f"{'function':<24}{'calls':>10}{'own s':>10}{'own %':>8}{'total s':>10}{'us/call':>10}"]
+        ranked = sorted((name for name in self.functions if self.calls[name]), key=self.own.get, reverse=True)
+        for name in ranked[:limit]:
+            share = self.own[name] / self.elapsed * 100 if self.elapsed else 0.0
+            lines.append(f"{name:<24}{self.calls[name]:>10}{self.own[name]:>10.3f}{share:>8.1f}{self.total[name]:>10.3f}"
+                         f"{self.own[name] / self.calls[name] * 1e6:>10.1f}")
+        return "\n".join(lines)
+
+class SearchMetrics:
+    """
+    Counters of one AI_makeMove search. Nodes include those searched by worker processes; the other counters only
+    cover the search run in this process.
+    """
+    __slots__ = ("elapsed", "nodes", "interior_nodes", "leaf_nodes", "quiescence_nodes", "evaluations", "cutoffs",
+                 "first_move_cutoffs", "qsearch_cutoffs", "tt_probes", "tt_hits", "tt_cutoffs", "tablebase_hits", "eval_cache_hits",
+                 "eval_cache_misses", "iterations")
+
+    def __init__(self):
+        self.elapsed = 0.0 # seconds spent by the search
+        self.nodes = 0 # states explored, as counted in total_states_explored
+        self.interior_nodes = 0 # nodes whose moves were searched
+        self.leaf_nodes = 0 # nodes answered without searching moves (horizon, game end, transposition table, tablebases)
+        self.quiescence_nodes = 0
+        self.evaluations = 0 # evaluate_board calls made by the search
+        self.cutoffs = 0 # beta cutoffs of alpha_beta
+        self.first_move_cutoffs = 0 # alpha_beta beta cutoffs caused by the first ordered move
+        self.qsearch_cutoffs = 0 # beta cutoffs of quiescence, kept out of the first move cutoff rate
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0 # probes whose entry answered the node
+        self.tablebase_hits = 0
+        self.eval_cache_hits = 0 # evaluate_board calls answered by the evaluation cache
+        self.eval_cache_misses = 0
+        self.iterations = [] # per iterative deepening iteration: depth, time, nodes, score, completed
+
+    """
+    Returns the counters with the derived rates (nodes/second, first move cutoff rate, transposition table and
+    evaluation cache hit rates)
+    """
+    def to_dict(self):
+        metrics = {name: getattr(self, name) for name in self.__slots__}
+        metrics["nps"] = self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+        metrics["first_move_cutoff_rate"] = self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+        metrics["tt_hit_rate"] = self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+        eval_cache_probes = self.eval_cache_hits + self.eval_cache_misses
+        metrics["eval_cache_hit_rate"] = self.eval_cache_hits / eval_cache_probes if eval_cache_probes else 0.0
+        return metrics
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+class TraceWriter:
+    """
+    Game trace file kept open for the whole game. Records are buffered in memory and written in batches: when
+    batch_size records are pending, every flush_interval seconds from a background thread, and when the writer is
+    closed. Writers still open when the program exits (game modes end with exit) are closed then.
+    """
+
+    def __init__(self, filename, mode="a", batch_size=64, flush_interval=1.0):
+        self.filename = filename
+        self.file = open(filename, mode)
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.thread = None
+        if flush_interval:
+            self.thread = threading.Thread(target=self.flush_periodically, args=(flush_interval,), daemon=True)
+            self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, record):
+        with self.lock:
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self.flush_pending()
+
+    def flush(self):
+        with self.lock:
+            self.flush_pending()
+
+    """
+    Writes the pending records in one call, the lock must be held
+    """
+    def flush_pending(self):
+        if self.pending and not self.file.closed:
+            self.file.write(''.join(self.pending))
+            self.file.flush()
+        self.pending = []
+
+    def flush_periodically(self, interval):
+        while not self.closed.wait(interval):
+            self.flush()
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            self.flush_pending()
+            self.file.close()
+        atexit.unregister(self.close)
+
 class MiniChess:
     def __init__(self):
+        self.move_generator = "tables" # "tables" = precomputed move tables | "bitboard" = Bitboards generator
         self.current_game_state = self.init_board()
         self.turn_counter = 1 #Variable to keep track of the current turn
         self.turn_with_piece_taken = 1 #Variable to keep track of the last turn a piece was taken.
@@ -16,9 +1331,37 @@ class MiniChess:
         self.invalid_move_counter = 0 #variable used to end the game if a human enters two invalid moves
         self.AI_time_out = 0.0005 # time before AI needs to exit loops
         self.AI_Start_Time = 0.0001
-        self.AI_time_out = 0.0005 # time before AI needs to exit loops
-        self.AI_Start_Time = 0.0001
+        self.deadline_interval = DEADLINE_CHECK_NODES[0] # nodes between two reads of the clock, adapted to the search speed
+        self.deadline_countdown = DEADLINE_CHECK_NODES[0] # nodes left before the next read of the clock
+        self.deadline_nodes = DEADLINE_CHECK_NODES[0] # value of deadline_countdown after the last read of the clock
+        self.deadline_checked = 0.0 # time.perf_counter() of the last read of the clock
+        self.max_depth = MAX_SEARCH_DEPTH # deepest iteration of the alpha-beta iterative deepening
+        self.use_quiescence = True # extend alpha-beta leaves with captures and promotions
+        self.completed_depth = 0 # depth of the last iteration the alpha-beta search completed
+        self.principal_variation = [] # best line found by the last completed iteration
+        self.killer_moves = [] # per ply, the last two quiet moves that caused a cutoff
+        self.history = {} # (piece, end square) -> score of quiet moves that caused cutoffs
         self.log_filename = "lol.txt"
+        self.trace = None # TraceWriter of the game trace file, opened on first use
+        self.total_states_explored = 0 # states explored by the AI since the start of the game
+        self.depth_exploration_stats = {} # states explored by the AI since the start of the game, per depth
+        self.metrics = SearchMetrics() # counters of the last AI_makeMove search
+        self.metrics_writer = None # TraceWriter receiving the metrics of every search as a JSON line, None = not exported
+        self.transposition_table = TranspositionTable() # kept between moves of a game
+        self.evaluation_cache = EvaluationCache() # results of the mobility heuristics, None = always evaluate
+        self.search_timed_out = False # set when the search runs out of time or is stopped
+        self.workers = 1 # processes searching the root moves in parallel, 1 = search in this process
+        self.search_pool = None # ProcessPoolExecutor of the parallel root search, created on first use
+        self.search_pool_bound = None # multiprocessing.Value shared with the pool workers
+        self.smp_helpers = 0 # Lazy SMP helper processes searching alongside alpha-beta, 0 = disabled
+        self.smp_pool = None # ProcessPoolExecutor of the Lazy SMP helpers, created on first use
+        self.smp_stop_flag = None # multiprocessing.RawValue telling the Lazy SMP helpers to stop
+        self.stop_flag = None # object whose value becomes true when the search must stop early (Lazy SMP helpers, stop command)
+        self.iteration_callback = None # called with (depth, best_move, best_value) after every completed iteration
+        self.opening_book = None # OpeningBook consulted by AI_makeMove before searching, None = always search
+        self.tablebases = None # Tablebases probed by alpha_beta once few pieces are left, None = always search
+        self.draw_budget = 0 # plies left at the root of the search before check_draw ends the game
+        self.root_pieces = 0 # number of pieces at the root of the search
     """
     Initialize the board
 
@@ -38,10 +1381,63 @@ class MiniChess:
                 ['.', 'wN', 'wB', 'wQ', 'wK']],
                 "turn": 'white',
                 }
-
+        self.refresh_game_state(state)
 
         return state
 
+    """
+    Recomputes from scratch the terms the search keeps up to date incrementally in the game state:
+    the Zobrist "hash", the "material" balance (white minus black), the number of "pieces", the "kings" squares (None once captured)
+    and the king "safety" counts of [white, black]. Must be called on any game state built outside init_board.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - game_state: dictionary | the same dictionary with the incremental terms filled in
+    """
+    def refresh_game_state(self, game_state):
+        material = 0
+        pieces = 0
+        kings = [None, None]
+        for row_index, row in enumerate(game_state["board"]):
+            for col_index, square in enumerate(row):
+                if square != ".":
+                    material += SIGNED_PIECE_VALUES[square]
+                    pieces += 1
+                    if square[1] == "K":
+                        kings[COLOR_INDEX[square[0]]] = row_index * 5 + col_index
+        safety = [0, 0]
+        if kings[0] is not None:
+            safety[0] = self.white_king_safety(divmod(kings[0], 5), game_state)
+        if kings[1] is not None:
+            safety[1] = self.black_king_safety(divmod(kings[1], 5), game_state)
+        game_state["hash"] = self.zobrist_hash(game_state)
+        game_state["material"] = material
+        game_state["pieces"] = pieces
+        game_state["kings"] = kings
+        game_state["safety"] = safety
+        if self.move_generator == "bitboard":
+            game_state["bitboards"] = Bitboards(Position.from_game_state(game_state))
+        else:
+            game_state.pop("bitboards", None)
+        return game_state
+
+    """
+    Computes the Zobrist hash of a game state from scratch. The search keeps it up to date incrementally in game_state["hash"]
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - int | 64-bit hash of the board and the player turn
+    """
+    def zobrist_hash(self, game_state):
+        key = ZOBRIST_BLACK_TO_MOVE if game_state["turn"] == "black" else 0
+        for row_index, row in enumerate(game_state["board"]):
+            for col_index, square in enumerate(row):
+                if square != ".":
+                    key ^= ZOBRIST_KEYS[square][row_index * 5 + col_index]
+        return key
+
     """
     Prints the board
     
@@ -81,8 +1477,26 @@ class MiniChess:
         - valid moves:   list | A list of nested tuples corresponding to valid moves [((start_row, start_col),(end_row, end_col)),((start_row, start_col),(end_row, end_col))]
     """
     def valid_moves(self, game_state):
+        #Converting the encoded moves to chess terminology
+        return [(SQUARE_NAMES[(move & MOVE_SQUARES) // 25], SQUARE_NAMES[(move & MOVE_SQUARES) % 25]) for move in self.generate_moves(game_state)]
+
+    """
+    Returns the valid moves of the player to move as encoded ints (start_square*25 + end_square, plus MOVE_PROMOTION
+    for a promotion). This is the move generator used by the search.
+
+    Args:
+        - game_state:   dictionary | Dictionary representing the current game state
+    Returns:
+        - moves:   list | A list of ints corresponding to valid moves
+    """
+    def generate_moves(self, game_state):
+        if self.move_generator == "bitboard":
+            bitboards = game_state.get("bitboards")
+            if bitboards is None:
+                bitboards = Bitboards(Position.from_game_state(game_state))
+            return bitboards.moves()
         #Creating a list of all valid moves which will be returned at the end of the function
-        valid_moves = list()
+        moves = list()
 
         #Storing the turn value
         turn = game_state["turn"]
@@ -93,123 +1507,112 @@ class MiniChess:
                 if (square[0] != '.' and square[0] == turn[0]):
                     piece_type = square[1] #storing the piece type
                     piece_color = square[0] #storing the piece color
-                    #Converting the square coordinates to chess terminology
-                    start_row = self.number_to_letter(col_index)
-                    start_col = str(5-row_index)
+                    start = row_index * 5 + col_index
                     #Checking the valid moves based on the piece type
                     if (piece_type == "K"):
-                       self.king_valid_moves(row_index, col_index, start_row, start_col, game_state, valid_moves)
-                    if (piece_type == "N"):
-                        self.knight_valid_moves(row_index, col_index, start_row, start_col, game_state, valid_moves)
-                    if (piece_type == "p" and piece_color == "w"):
-                        self.white_pawn_valid_moves(row_index, col_index, start_row, start_col, game_state, valid_moves)
-                    if (piece_type == "p" and piece_color == "b"):
-                        self.black_pawn_valid_moves(row_index, col_index, start_row, start_col, game_state, valid_moves)
-                    if (piece_type == "B"):
-                        self.bishop_valid_moves(row_index, col_index, start_row, start_col, game_state, valid_moves)
-                    if (piece_type == "Q"):
-                        self.queen_valid_moves(row_index, col_index, start_row, start_col, game_state, valid_moves)
-        return valid_moves
+                       self.king_valid_moves(start, game_state, moves)
+                    elif (piece_type == "N"):
+                        self.knight_valid_moves(start, game_state, moves)
+                    elif (piece_type == "p" and piece_color == "w"):
+                        self.white_pawn_valid_moves(start, game_state, moves)
+                    elif (piece_type == "p" and piece_color == "b"):
+                        self.black_pawn_valid_moves(start, game_state, moves)
+                    elif (piece_type == "B"):
+                        self.bishop_valid_moves(start, game_state, moves)
+                    elif (piece_type == "Q"):
+                        self.queen_valid_moves(start, game_state, moves)
+        return moves
 
     """
     Updates the list of valid moves with the valid moves for the "King" piece
 
     Args:
-        - row_index: int | current row position of the square in the dictionary of game_state
-        - col_index: int | current column position of the square in the dictionary of game_state
-        - start_now: str | current row letter of the square
-        - start_col: int | current column number of the square
+        - start: int | square of the piece (row*5 + col)
         - game_state: dict | Dictionary representing the current game state
-        - valid_moves: list | A list of nested tuples corresponding to valid moves
-    Returns:
-        - valid_moves: list | Updated list of nested tuples corresponding to valid moves
-    """
-    def king_valid_moves(self, row_index, col_index, start_row, start_col, game_state, valid_moves):
-        for i, row in enumerate(game_state["board"]):
-            for j, square in enumerate(row):
-                if (square == "." or square[0] != game_state["turn"][0]):
-                    if (abs(i-row_index) <= 1 and abs(j-col_index) <= 1):
-                        end_row = self.number_to_letter(j)
-                        end_col = str(5-i)
-                        valid_moves.append(((start_row,start_col),(end_row,end_col)))
+        - moves: list | A list of encoded moves
+    Returns:
+        - None
+    """
+    def king_valid_moves(self, start, game_state, moves):
+        self.leaper_valid_moves(KING_TARGETS[start], start, game_state, moves)
         return
 
     """
     Updates the list of valid moves with the valid moves for the "Knight" piece
     
     """
-    def knight_valid_moves(self, row_index, col_index, start_row, start_col, game_state, valid_moves):
-        for i, row in enumerate(game_state["board"]):
-            for j, square in enumerate(row):
-                if (square == "." or square[0] != game_state["turn"][0]):
-                    if (abs(i-row_index) == 2 and abs(j-col_index) == 1) or (abs(i-row_index) == 1 and abs(j-col_index) == 2):
-                        end_row = self.number_to_letter(j)
-                        end_col = str(5-i)
-                        valid_moves.append(((start_row,start_col),(end_row,end_col)))
+    def knight_valid_moves(self, start, game_state, moves):
+        self.leaper_valid_moves(KNIGHT_TARGETS[start], start, game_state, moves)
+        return
+
+    """
+    Updates the list of valid moves with the moves to the precomputed target squares of a king or a knight.
+    Every target that is empty or holds an opponent piece is a valid move.
+
+    Args:
+        - targets: tuple | precomputed (row, col, square) targets of the piece (KING_TARGETS or KNIGHT_TARGETS entry)
+        - start: int | square of the piece (row*5 + col)
+        - game_state: dict | Dictionary representing the current game state
+        - moves: list | A list of encoded moves
+    Returns:
+        - None
+    """
+    def leaper_valid_moves(self, targets, start, game_state, moves):
+        board = game_state["board"]
+        color = game_state["turn"][0]
+        base = start * 25
+        for i, j, end in targets:
+            if board[i][j][0] != color:
+                moves.append(base + end)
         return
 
     """
     Updates the list of valid moves with the valid moves for the "White Pawn" piece
     
     """
-    def white_pawn_valid_moves(self, row_index, col_index, start_row, start_col, game_state, valid_moves):
-        for i, row in enumerate(game_state["board"]):
-            for j, square in enumerate(row):
-                    if (square == "."):
-                        if ((i-row_index) == -1 and j == col_index):
-                            end_row = self.number_to_letter(j)
-                            end_col = str(5-i)
-                            valid_moves.append(((start_row,start_col),(end_row,end_col)))
-                    elif (square[0] != game_state["turn"][0]):
-                        if ((i-row_index) == -1 and abs(j-col_index) == 1):
-                            end_row = self.number_to_letter(j)
-                            end_col = str(5-i)
-                            valid_moves.append(((start_row,start_col),(end_row,end_col)))
+    def white_pawn_valid_moves(self, start, game_state, moves):
+        self.pawn_valid_moves(WHITE_PAWN_TARGETS[start], start, game_state, moves)
         return
 
     """
     Updates the list of valid moves with the valid moves for the "Black Pawn" piece
     
     """
-    def black_pawn_valid_moves(self, row_index, col_index, start_row, start_col, game_state, valid_moves):
-        for i, row in enumerate(game_state["board"]):
-            for j, square in enumerate(row):
-                    if (square == "."):
-                        if ((i-row_index) == 1 and j == col_index):
-                            end_row = self.number_to_letter(j)
-                            end_col = str(5-i)
-                            valid_moves.append(((start_row,start_col),(end_row,end_col)))
-                    elif (square[0] != game_state["turn"][0]):
-                        if ((i-row_index) == 1 and abs(j-col_index) == 1):
-                            end_row = self.number_to_letter(j)
-                            end_col = str(5-i)
-                            valid_moves.append(((start_row,start_col),(end_row,end_col)))
+    def black_pawn_valid_moves(self, start, game_state, moves):
+        self.pawn_valid_moves(BLACK_PAWN_TARGETS[start], start, game_state, moves)
+        return
+
+    """
+    Updates the list of valid moves with the moves to the precomputed target squares of a pawn.
+    The forward square is valid when empty, the diagonal squares when they hold an opponent piece.
+
+    Args:
+        - targets: tuple | precomputed (row, col, target, is_capture) targets of the pawn, target carrying the promotion flag
+        - start: int | square of the piece (row*5 + col)
+        - game_state: dict | Dictionary representing the current game state
+        - moves: list | A list of encoded moves
+    Returns:
+        - None
+    """
+    def pawn_valid_moves(self, targets, start, game_state, moves):
+        board = game_state["board"]
+        color = game_state["turn"][0]
+        base = start * 25
+        for i, j, target, is_capture in targets:
+            square = board[i][j]
+            if is_capture:
+                if square != "." and square[0] != color:
+                    moves.append(base + target)
+            elif square == ".":
+                moves.append(base + target)
         return
 
     """
     Updates the list of valid moves with the valid moves for the "Bishop" piece
     
     """
-    def bishop_valid_moves(self, row_index, col_index, start_row, start_col, game_state, valid_moves):
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]  # top left, top right, bottom left, bottom right
-        for d in directions:
-            i, j = row_index + d[0], col_index + d[1]
-            while 0 <= i < 5 and 0 <= j < 5:
-                if game_state["board"][i][j] == ".":
-                    end_row = self.number_to_letter(j)
-                    end_col = str(5 - i)
-                    valid_moves.append(((start_row, start_col), (end_row, end_col)))
-                elif game_state["board"][i][j][0] == game_state["turn"][0]:  # same color piece blocks
-                    break
-                elif game_state["board"][i][j][0] != game_state["turn"][0]:  # capture opponents piece
-                    end_row = self.number_to_letter(j)
-                    end_col = str(5 - i)
-                    valid_moves.append(((start_row, start_col), (end_row, end_col)))
-                    break
-                else:
-                    break
-                i += d[0]
-                j += d[1]
+    def bishop_valid_moves(self, start, game_state, moves):
+        self.slider_valid_moves(BISHOP_RAYS[start], start, game_state, moves)
         return
 
     """
@@ -217,30 +1620,66 @@ class MiniChess:
     
     """
 
-    def queen_valid_moves(self, row_index, col_index, start_row, start_col, game_state, valid_moves):
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1),  # bishop directions
-                      (-1, 0), (1, 0), (0, -1), (0, 1)]  # rook directions
+    def queen_valid_moves(self, start, game_state, moves):
+        self.slider_valid_moves(QUEEN_RAYS[start], start, game_state, moves)
+        return
 
-        for d in directions:
-            i, j = row_index + d[0], col_index + d[1]
-            while 0 <= i < 5 and 0 <= j < 5:
-                if game_state["board"][i][j] == ".":
-                    end_row = self.number_to_letter(j)
-                    end_col = str(5 - i)
-                    valid_moves.append(((start_row, start_col), (end_row, end_col)))
-                elif game_state["board"][i][j][0] == game_state["turn"][0]:
-                    break
-                elif game_state["board"][i][j][0] != game_state["turn"][0]:
-                    end_row = self.number_to_letter(j)
-                    end_col = str(5 - i)
-                    valid_moves.append(((start_row, start_col), (end_row, end_col)))
-                    break
-                else:
-                    break
-                i += d[0]
-                j += d[1]
+    """
+    Updates the list of valid moves by walking the precomputed rays of a bishop or a queen.
+    Each ray stops at the first piece, which is captured if it belongs to the opponent.
+
+    Args:
+        - rays: tuple | precomputed rays, each a tuple of (row, col, square) ordered away from the piece
+        - start: int | square of the piece (row*5 + col)
+        - game_state: dict | Dictionary representing the current game state
+        - moves: list | A list of encoded moves
+    Returns:
+        - None
+    """
+    def slider_valid_moves(self, rays, start, game_state, moves):
+        board = game_state["board"]
+        color = game_state["turn"][0]
+        base = start * 25
+        for ray in rays:
+            for i, j, end in ray:
+                square = board[i][j]
+                if square == ".":
+                    moves.append(base + end)
+                    continue
+                if square[0] != color:  # capture opponents piece
+                    moves.append(base + end)
+                break  # any piece blocks the rest of the ray
         return
 
+    """
+    Encodes a move given as board coordinates into the int used by the search
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state (to detect promotions)
+        - move: tuple | the move ((start_row, start_col),(end_row, end_col))
+    Returns:
+        - int | start_square*25 + end_square, plus MOVE_PROMOTION if a pawn reaches the last row
+    """
+    def encode_move(self, game_state, move):
+        (start_row, start_col), (end_row, end_col) = move
+        encoded = (start_row * 5 + start_col) * 25 + end_row * 5 + end_col
+        piece = game_state["board"][start_row][start_col]
+        if (piece == "wp" and end_row == 0) or (piece == "bp" and end_row == 4):
+            encoded += MOVE_PROMOTION
+        return encoded
+
+    """
+    Decodes a move int into board coordinates
+
+    Args:
+        - move: int | encoded move
+    Returns:
+        - tuple | the move ((start_row, start_col),(end_row, end_col))
+    """
+    def decode_move(self, move):
+        start, end = divmod(move & MOVE_SQUARES, 25)
+        return (SQUARE_COORDS[start], SQUARE_COORDS[end])
+
     """
     Converts the row numbers into letters for syntax validity
 
@@ -263,55 +1702,80 @@ class MiniChess:
                 search_score=0, states_explored=0, depth_stats=None, player=None):
         """Logs moves made by AI or Human based on game mode and player type."""
 
-        file_name = self.log_filename
+        #The record is built in memory and handed to the trace writer in one piece
+        record = io.StringIO()
+        board_move = self.unparse_input(move)
+        start, end = board_move[0], board_move[1]
 
+        record.write(f"\nPlayer = {player if player else game_state['turn']}\n")
+        record.write(f"Turn #{self.turn_counter}\n")
+        record.write(f"Move from {start} to {end}\n")
 
+        # If the player is an AI, log AI-specific information
+        if self.is_ai_player(game_state["turn"]):
+            record.write(f"Time for this action: {ai_time:.3f} sec\n")
+            record.write(f"Heuristic score: {heuristic_score}\n")
+            record.write(f"{'Alpha-Beta' if self.algorithm else 'Minimax'} search score: {search_score}\n")
+            record.write(f"Cumulative states explored: {states_explored}\n")
 
-        with open(file_name, "a") as file:
-            board_move = self.unparse_input(move)
-            start, end = board_move[0], board_move[1]
+            if depth_stats and sum(depth_stats.values()) > 0:
+                total_states = sum(depth_stats.values())
 
-            file.write(f"\nPlayer = {player if player else game_state['turn']}\n")
-            file.write(f"Turn #{self.turn_counter}\n")
-            file.write(f"Move from {start} to {end}\n")
+                record.write("Cumulative states explored by depth: {}\n".format(
+                    ' '.join(f"{d}={depth_stats[d]}" for d in sorted(depth_stats))
+                ))
 
-            # If the player is an AI, log AI-specific information
-            if self.is_ai_player(game_state["turn"]):
-                file.write(f"Time for this action: {ai_time:.3f} sec\n")
-                file.write(f"Heuristic score: {heuristic_score}\n")
-                file.write(f"{'Alpha-Beta' if self.algorithm else 'Minimax'} search score: {search_score}\n")
-                file.write(f"Cumulative states explored: {states_explored}\n")
+                record.write("Cumulative % states explored by depth: {}\n".format(
+                    ' '.join(f"{d}={depth_stats[d] / total_states:.1%}" for d in sorted(depth_stats))
+                ))
 
-                if depth_stats and sum(depth_stats.values()) > 0:
-                    total_states = sum(depth_stats.values())
+                # Optional: average branching factor (if meaningful)
+                total_nodes = sum(depth_stats.values()) - depth_stats.get(0, 0)
+                total_branches = sum(d * depth_stats[d] for d in depth_stats if d > 0)
+                avg_branching_factor = total_branches / total_nodes if total_nodes > 0 else 0
+                record.write(f"Average branching factor: {avg_branching_factor:.2f}\n")
 
-                    file.write("Cumulative states explored by depth: {}\n".format(
-                        ' '.join(f"{d}={depth_stats[d]}" for d in sorted(depth_stats))
-                    ))
+        # it's a human move, log only basics
+        else:
+            record.write("Human move (no AI stats).\n")
 
-                    file.write("Cumulative % states explored by depth: {}\n".format(
-                        ' '.join(f"{d}={depth_stats[d] / total_states:.1%}" for d in sorted(depth_stats))
-                    ))
+        # Always log updated board
+        record.write("New configuration:\n")
+        for i, row in enumerate(self.current_game_state["board"], start=1):
+            record.write(str(6 - i) + "  " + ' '.join(piece.rjust(3) for piece in row) + "\n")
+        record.write("\n")
 
-                    # Optional: average branching factor (if meaningful)
-                    total_nodes = sum(depth_stats.values()) - depth_stats.get(0, 0)
-                    total_branches = sum(d * depth_stats[d] for d in depth_stats if d > 0)
-                    avg_branching_factor = total_branches / total_nodes if total_nodes > 0 else 0
-                    file.write(f"Average branching factor: {avg_branching_factor:.2f}\n")
+        record.write("\n")  # Blank line for readability
 
-            # it's a human move, log only basics
-            else:
-                file.write("Human move (no AI stats).\n")
+        self.trace_writer().write(record.getvalue())
+        return
 
-            # Always log updated board
-            file.write("New configuration:\n")
-            for i, row in enumerate(self.current_game_state["board"], start=1):
-                file.write(str(6 - i) + "  " + ' '.join(piece.rjust(3) for piece in row) + "\n")
-            file.write("\n")
+    """
+    Returns the trace writer of the game trace file (log_filename), opening it in append mode on first use
 
-            file.write("\n")  # Blank line for readability
+    Args:
+        - None
+    Returns:
+        - TraceWriter | the writer of the current trace file
+    """
+    def trace_writer(self):
+        if self.trace is None or self.trace.filename != self.log_filename:
+            self.open_trace()
+        return self.trace
 
-        return
+    """
+    Opens log_filename as the game trace file, closing (and flushing) the previous one
+
+    Args:
+        - mode: string | "a" to append, "w" to start a new file
+    Returns:
+        - TraceWriter | the writer of the trace file
+    """
+    def open_trace(self, mode="a"):
+        if self.trace is not None:
+            self.trace.close()
+        self.trace = TraceWriter(self.log_filename, mode)
+        return self.trace
 
     """
     Modify the board to make a move
@@ -332,26 +1796,14 @@ class MiniChess:
         #Update the turn_with_piece_taken if a piece is taken
         if  game_state["board"][end_row][end_col] != '.':
             self.turn_with_piece_taken = self.turn_counter
-        #store the piece value in a variable
-        piece = game_state["board"][start_row][start_col]
-        #Replace the starting position with a '.' and move the piece to the end location
-        game_state["board"][start_row][start_col] = '.'
-        game_state["board"][end_row][end_col] = piece
+        #Moving the piece (promoting pawns that reach the end row) and switching the turn, which also keeps
+        #the hash and evaluation terms of the game state up to date
+        self.simulate_make_move(game_state, self.encode_move(game_state, move))
         #Logging the move performed
         # self.log_move(game_state,move) #Logging the move of the player
-        #Promoting the pawns if they reach the end row
-        if piece == "wp" and end_row == 0:
-            game_state["board"][end_row][end_col] = "wQ"
-        if piece == "bp" and end_row == 4:
-            game_state["board"][end_row][end_col] = "bQ"
-        #Switiching the turn once the move is successfuly performed
+        #Increase the turn counter once black has moved
         if game_state["turn"] == "white":
-            game_state["turn"] = "black"
-        else:
-            game_state["turn"] = "white"
-        #Increase the turn counter and print it
             self.turn_counter += 1
-            print(self.turn_counter)
         #return the new game state after the move has been performed
         return game_state
 
@@ -398,12 +1850,14 @@ class MiniChess:
     Unparse the input string and modify it into chess terminology
 
     Args:
-        - move: tuples representing a move "((1,2),(0,3))"
+        - move: tuples representing a move "((1,2),(0,3))", or the encoded int used by the search
     Returns:
         - string representing a move "B2 B3"
     """
     def unparse_input(self, move):
         try:
+            if isinstance(move, int):
+                move = self.decode_move(move)  # Encoded move from the search
             start, end = move  # Extract start and end tuples
 
             # Convert row index back to board notation (e.g., 3 -> "B")
@@ -476,9 +1930,8 @@ class MiniChess:
         - true if the round we have reached is a draw. False otherwise and game continues as normal
     """
     def check_draw(self):
-        if self.turn_counter - self.turn_with_piece_taken >= 10: #edit to change number of turns till end of game
-            with open("gameTrace-false-5-10.txt", "a") as file:
-                file.write("\nMatch ended in a draw after " + str(self.turn_counter - 1) + " turns")
+        if self.turn_counter - self.turn_with_piece_taken >= DRAW_TURNS_WITHOUT_CAPTURE:
+            self.trace_writer().write("\nMatch ended in a draw after " + str(self.turn_counter - 1) + " turns")
             return True
         else:
             return False
@@ -538,119 +1991,140 @@ class MiniChess:
                         protection_square += 1
         return protection_square
 
+    """
+    Returns the number of squares around a king square that are taken by pieces of the king's colour,
+    using the precomputed king move tables
+
+    Args:
+        - king_sq: int | square of the king (row*5 + col)
+        - color: str | "w" or "b", the colour of the king
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - int | number of neighbouring squares holding a piece of the same colour
+    """
+    def king_safety(self, king_sq, color, game_state):
+        board = game_state["board"]
+        return sum(1 for i, j, _ in KING_TARGETS[king_sq] if board[i][j][0] == color)
+
+    """
+    Counts the valid moves of both players in a single pass over the board, without building move lists
+    and without changing the player turn of the game state
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - white_moves: int | number of valid moves white would have
+        - black_moves: int | number of valid moves black would have
+    """
+    def count_mobility(self, game_state):
+        if self.move_generator == "bitboard":
+            bitboards = game_state.get("bitboards")
+            if bitboards is None:
+                bitboards = Bitboards(Position.from_game_state(game_state))
+            return bitboards.mobility(WHITE), bitboards.mobility(BLACK)
+        board = game_state["board"]
+        white_moves = 0
+        black_moves = 0
+        for row_index, row in enumerate(board):
+            for col_index, square in enumerate(row):
+                if square == ".":
+                    continue
+                color = square[0]
+                piece_type = square[1]
+                sq = row_index * 5 + col_index
+                count = 0
+                if piece_type == "K" or piece_type == "N":
+                    for i, j, _ in (KING_TARGETS[sq] if piece_type == "K" else KNIGHT_TARGETS[sq]):
+                        if board[i][j][0] != color:
+                            count += 1
+                elif piece_type == "p":
+                    for i, j, _, is_capture in (WHITE_PAWN_TARGETS[sq] if color == "w" else BLACK_PAWN_TARGETS[sq]):
+                        target = board[i][j]
+                        if is_capture:
+                            if target != "." and target[0] != color:
+                                count += 1
+                        elif target == ".":
+                            count += 1
+                else:
+                    for ray in (QUEEN_RAYS[sq] if piece_type == "Q" else BISHOP_RAYS[sq]):
+                        for i, j, _ in ray:
+                            target = board[i][j]
+                            if target == ".":
+                                count += 1
+                                continue
+                            if target[0] != color:
+                                count += 1
+                            break
+                if color == "w":
+                    white_moves += count
+                else:
+                    black_moves += count
+        return white_moves, black_moves
+
     """
     Evaluates a board state and updates the heuristic score based on the heuristic chosen (3 heuristics available)
     NOTE: White player tries to maximies and Black player tries to minimize in all heuristics
 
     Args:
-        - game_state: dictionary | Dictionary representing the current game state
+        - game_state: dictionary | Dictionary representing the current game state (with the terms kept by refresh_game_state)
     Returns:
+        - game_end: True if a king has been captured
         - score: integer value representing the heuristic score of the board state passed as a parameter to the function
     """
     def evaluate_board(self, game_state):
+        #Material balance, king squares and king safety are kept up to date by simulate_make_move/simulate_unmake_move
+        score = game_state["material"]
+        white_king, black_king = game_state["kings"]
+        game_end = white_king is None or black_king is None
         #Heuristic 0
         if self.heuristic == 0:     #UNCOMMENT TO ADD OTHER HEURISTICS
-            piece_values = {"K": 999, "Q": 9, "B": 3, "N": 3, "p": 1}
-            score = 0
-            blackKing = False
-            whiteKing = False
-            #Assigning values to each piece on the board based on the heuristic function defined
-            for row in game_state["board"]:
-                for square in row:
-                    if square != ".":
-                        value = piece_values[square[1]]
-                        #Increase the value of score if it is a white piece, otherwise decrease
-                        score += value if square[0] == "w" else -value
-                    if square == "wK":
-                        whiteKing = True
-                    if square == "bK":
-                        blackKing = True
-
-            if whiteKing == False or blackKing == False: return True,score
-            return False,score
+            return game_end,score
+
+        #Heuristics 1 and 2 count the moves of both players: reuse the result of a position already evaluated
+        cache = self.evaluation_cache
+        if cache is not None:
+            key = game_state["hash"] ^ ZOBRIST_HEURISTIC[self.heuristic]
+            entry = cache.probe(key)
+            if entry is not None:
+                self.metrics.eval_cache_hits += 1
+                return entry
+            self.metrics.eval_cache_misses += 1
+
         #Heuristic 1
-        elif self.heuristic == 1:   #UNCOMMENT TO ADD OTHER HEURISTICS
-            piece_values = {"K": 999, "Q": 9, "B": 3, "N": 3, "p": 1}
-            score = 0
-            blackKing = False
-            whiteKing = False
-            #Assigning values to each piece on the board based on the heuristic function defined
-            for row in game_state["board"]:
-                for square in row:
-                    if square != ".":
-                        value = piece_values[square[1]]
-                        #Increase the value of score if it is a white piece, otherwise decrease
-                        score += value if square[0] == "w" else -value
-                    if square == "wK":
-                        whiteKing = True
-                    if square == "bK":
-                        blackKing = True
-
-            #Adjusting the score value based on the total number of valid_moves for the current game_state
-            if (game_state["turn"] == "white"):
-                num_white_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "black"
-                num_black_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "white"
-            else:
-                num_black_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "white"
-                num_white_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "black"
+        if self.heuristic == 1:   #UNCOMMENT TO ADD OTHER HEURISTICS
+            #Adjusting the score value based on the total number of valid_moves of each player for the current game_state
+            white_moves, black_moves = self.count_mobility(game_state)
+            num_white_moves = white_moves * 0.1
+            num_black_moves = black_moves * 0.1
 
             score += (num_white_moves - num_black_moves)
             # print("New score: " + str(score))
-
-            if whiteKing == False or blackKing == False: return True,score
-            return False,score
         #Heuristic 2
         else:
-            piece_values = {"K": 999, "Q": 9, "B": 3, "N": 3, "p": 1}
-            score = 0
-            blackKing = False
-            whiteKing = False
-            #Assigning values to each piece on the board based on the heuristic function defined
-            for row_index, row in enumerate(game_state["board"]):  # Iterate over rows
-                for col_index, square in enumerate(row):
-                    if square != ".":
-                        value = piece_values[square[1]]
-                        #Increase the value of score if it is a white piece, otherwise decrease
-                        score += value if square[0] == "w" else -value
-                    if square == "wK":
-                        king_pos = (row_index, col_index) #storing the row and col index of the white king
-                        white_king_safety = self.white_king_safety(king_pos, game_state) * 0.5 #Assessing the white king's safety
-                        #Adjusting the score value based on the king safety factors of white and black
-                        score += white_king_safety
-                        whiteKing = True
-                    if square == "bK":
-                        king_pos = (row_index, col_index)
-                        black_king_safety = self.black_king_safety(king_pos, game_state) * 0.5 
-                        score -= black_king_safety
-                        blackKing = True
-            
-            #Adjusting the score value based on the total number of valid_moves for the current game_state
-            if (game_state["turn"] == "white"):
-                num_white_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "black"
-                num_black_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "white"
-            else:
-                num_black_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "white"
-                num_white_moves = len(self.valid_moves(game_state)) * 0.1
-                game_state["turn"] = "black"
-                
+            #Adjusting the score value based on the king safety factors of white and black
+            white_safety, black_safety = game_state["safety"]
+            if white_king is not None:
+                score += white_safety * 0.5
+            if black_king is not None:
+                score -= black_safety * 0.5
+
+            #Adjusting the score value based on the total number of valid_moves of each player for the current game_state
+            white_moves, black_moves = self.count_mobility(game_state)
+            num_white_moves = white_moves * 0.1
+            num_black_moves = black_moves * 0.1
+
             score += (num_white_moves - num_black_moves)
 
-            if whiteKing == False or blackKing == False: return True,score
-            return False,score
+        if cache is not None:
+            cache.store(key, (game_end, score))
+        return game_end,score
 
     """
     Simulates a move on the board. Used by the minimax and alpha-beta algorithms to find the heuristic value of a new board state.
 
     Args:
         - game_state: dictionary | Dictionary representing the current game state
-        - move: tuple representing a move ((start_row, start_col),(end_row, end_col))
+        - move: int | encoded move (start_square*25 + end_square, plus MOVE_PROMOTION for a promotion)
     Returns:
         - piece: the type of piece that made the move
         - captured_piece: the piece type that was captured after performing the move
@@ -659,7 +2133,9 @@ class MiniChess:
     def simulate_make_move(self, game_state, move):
         ## SIMPLIFIED MAKE MOVE FUNCTION
 
-        start, end = move
+        start_sq, end_sq = divmod(move & MOVE_SQUARES, 25)
+        start = SQUARE_COORDS[start_sq]
+        end = SQUARE_COORDS[end_sq]
         # Save the piece at the destination (if any) for undoing later.
         captured_piece = game_state["board"][end[0]][end[1]]
 
@@ -669,10 +2145,38 @@ class MiniChess:
         game_state["board"][end[0]][end[1]] = piece
 
         # Pawn Promotion
-        if piece == "wp" and end[0] == 0:
-            game_state["board"][end[0]][end[1]] = "wQ"
-        if piece == "bp" and end[0] == 4:
-            game_state["board"][end[0]][end[1]] = "bQ"
+        placed_piece = piece
+        if move & MOVE_PROMOTION:
+            placed_piece = game_state["board"][end[0]][end[1]] = piece[0] + "Q"
+
+        # Update the Zobrist hash: piece leaves start, lands on end, captured piece disappears, turn flips.
+        key = game_state["hash"] ^ ZOBRIST_KEYS[piece][start_sq] ^ ZOBRIST_KEYS[placed_piece][end_sq] ^ ZOBRIST_BLACK_TO_MOVE
+        if captured_piece != ".":
+            key ^= ZOBRIST_KEYS[captured_piece][end_sq]
+        game_state["hash"] = key
+        bitboards = game_state.get("bitboards")
+        if bitboards is not None:
+            bitboards.toggle_move(start_sq, end_sq, PIECE_CODES[piece], PIECE_CODES[placed_piece], PIECE_CODES[captured_piece])
+
+        # Update the evaluation terms: only the start and end squares changed.
+        kings = game_state["kings"]
+        safety = game_state["safety"]
+        color = COLOR_INDEX[piece[0]]
+        if placed_piece != piece:
+            game_state["material"] += SIGNED_PIECE_VALUES[placed_piece] - SIGNED_PIECE_VALUES[piece]
+        if captured_piece != ".":
+            game_state["material"] -= SIGNED_PIECE_VALUES[captured_piece]
+            game_state["pieces"] -= 1
+            if captured_piece[1] == "K":
+                kings[1 - color] = None
+                safety[1 - color] = 0
+            elif kings[1 - color] is not None:
+                safety[1 - color] -= ADJACENT[kings[1 - color]][end_sq]
+        if piece[1] == "K":
+            kings[color] = end_sq
+            safety[color] = self.king_safety(end_sq, piece[0], game_state)
+        elif kings[color] is not None:
+            safety[color] += ADJACENT[kings[color]][end_sq] - ADJACENT[kings[color]][start_sq]
 
         # Switch the turn.
         game_state["turn"] = "black" if game_state["turn"] == "white" else "white"
@@ -685,192 +2189,769 @@ class MiniChess:
 
         Args:
             game_state (dict): The current board state and turn.
-            move (tuple): A tuple ((start_row, start_col), (end_row, end_col)).
+            move (int): The encoded move (start_square*25 + end_square, plus MOVE_PROMOTION for a promotion).
             captured_piece: The piece that was on the destination square before the move.
             :param game_state:
             :param captured_piece:
             :param original_piece:
     """
     def simulate_unmake_move(self, game_state, move, captured_piece, original_piece):
-        start, end = move
+        start_sq, end_sq = divmod(move & MOVE_SQUARES, 25)
+        start = SQUARE_COORDS[start_sq]
+        end = SQUARE_COORDS[end_sq]
         piece = original_piece
 
+        # Revert the Zobrist hash (XOR is its own inverse), reading the possibly promoted piece before restoring the board.
+        key = game_state["hash"] ^ ZOBRIST_KEYS[piece][start_sq] ^ ZOBRIST_KEYS[game_state["board"][end[0]][end[1]]][end_sq] ^ ZOBRIST_BLACK_TO_MOVE
+        if captured_piece != ".":
+            key ^= ZOBRIST_KEYS[captured_piece][end_sq]
+        game_state["hash"] = key
+
+        # Revert the material balance.
+        placed_piece = game_state["board"][end[0]][end[1]]
+        bitboards = game_state.get("bitboards")
+        if bitboards is not None:
+            bitboards.toggle_move(start_sq, end_sq, PIECE_CODES[piece], PIECE_CODES[placed_piece], PIECE_CODES[captured_piece])
+        if placed_piece != piece:
+            game_state["material"] -= SIGNED_PIECE_VALUES[placed_piece] - SIGNED_PIECE_VALUES[piece]
+        if captured_piece != ".":
+            game_state["material"] += SIGNED_PIECE_VALUES[captured_piece]
+            game_state["pieces"] += 1
+
         # Restore the moved piece to its original square.
         game_state["board"][start[0]][start[1]] = piece
         # Restore the captured piece (or empty square) at the destination.
         game_state["board"][end[0]][end[1]] = captured_piece
 
+        # Revert the king squares and safety counts on the restored board.
+        kings = game_state["kings"]
+        safety = game_state["safety"]
+        color = COLOR_INDEX[piece[0]]
+        if piece[1] == "K":
+            kings[color] = start_sq
+            safety[color] = self.king_safety(start_sq, piece[0], game_state)
+        elif kings[color] is not None:
+            safety[color] += ADJACENT[kings[color]][start_sq] - ADJACENT[kings[color]][end_sq]
+        if captured_piece != ".":
+            if captured_piece[1] == "K":
+                kings[1 - color] = end_sq
+                safety[1 - color] = self.king_safety(end_sq, captured_piece[0], game_state)
+            elif kings[1 - color] is not None:
+                safety[1 - color] += ADJACENT[kings[1 - color]][end_sq]
+
         # Switch the turn back.
         game_state["turn"] = "black" if game_state["turn"] == "white" else "white"
 
         return game_state
 
+    """
+    Counts the leaf nodes of the game tree of the given depth (perft). A move that captures a king ends the game,
+    so the position it reaches is not expanded any further.
+
+    Args:
+        - depth: int | number of plies to walk
+        - game_state: dictionary | position to start from, the initial board when None
+    Returns:
+        - nodes: int | number of leaf nodes at the given depth
+    """
+    def perft(self, depth, game_state=None):
+        if game_state is None:
+            game_state = self.init_board()
+        if "material" not in game_state:
+            self.refresh_game_state(game_state)
+        if depth <= 0:
+            return 1
+        MoveList = self.generate_moves(game_state)
+        if depth == 1:
+            return len(MoveList)
+        nodes = 0
+        for move in MoveList:
+            original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
+            if captured_piece[1:] != "K":
+                nodes += self.perft(depth - 1, game_state)
+            self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
+        return nodes
+
+    """
+    Splits the perft count by root move, useful to find which move a broken move generator gets wrong
+
+    Args:
+        - depth: int | number of plies to walk
+        - game_state: dictionary | position to start from, the initial board when None
+    Returns:
+        - dictionary | perft count below each root move, keyed by the move in chess terminology ("B2 B3")
+    """
+    def divide(self, depth, game_state=None):
+        if game_state is None:
+            game_state = self.init_board()
+        if "material" not in game_state:
+            self.refresh_game_state(game_state)
+        counts = {}
+        for move in self.generate_moves(game_state):
+            original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
+            nodes = 0 if captured_piece[1:] == "K" else self.perft(depth - 1, game_state)
+            self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
+            counts[' '.join(self.unparse_input(move))] = nodes
+        return counts
+
+    """
+    Runs perft (or divide) from the initial board for every depth up to max_depth and prints the node counts,
+    the nodes per second and whether the counts match PERFT_REFERENCE
+
+    Args:
+        - max_depth: int | deepest perft to run
+        - split: boolean | also print the divide counts of the deepest run
+    Returns:
+        - boolean | True if every count matched the reference
+    """
+    def perft_report(self, max_depth, split=False):
+        all_match = True
+        for depth in range(1, max_depth + 1):
+            start = time.perf_counter()
+            nodes = self.perft(depth)
+            elapsed = time.perf_counter() - start
+            expected = PERFT_REFERENCE.get(depth)
+            status = "no reference" if expected is None else ("OK" if nodes == expected else f"MISMATCH (expected {expected})")
+            all_match = all_match and (expected is None or nodes == expected)
+            nps = nodes / elapsed if elapsed > 0 else 0
+            print(f"perft({depth}) = {nodes} nodes in {elapsed:.3f} s ({nps:,.0f} nodes/s) {status}")
+        if split:
+            for move, nodes in self.divide(max_depth).items():
+                print(f"{move}: {nodes}")
+        return all_match
+
+
+    """
+    Returns the heuristic value of a board state from the point of view of the player to move (negamax convention)
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - score: the evaluate_board score, negated when black is to move
+    """
+    def evaluate_for_turn(self, game_state):
+        self.metrics.evaluations += 1
+        score = self.evaluate_board(game_state)[1]
+        return score if game_state["turn"] == "white" else -score
 
-    def alpha_beta(self, game_state, current_depth, alpha, beta):
-        piece_values = {"K": 999, "Q": 9, "B": 3, "N": 3, "p": 1}
-        MoveList = self.valid_moves(game_state)
-        game_end,board_heuristic = self.evaluate_board(game_state)
+    """
+    AI alpha-beta function: negamax search with principal variation search (PVS). Scores are from the point of view of
+    the player to move at each node. The first (best ordered) move is searched with the full window, every other move
+    with a null window around alpha first and only re-searched with the full window when it turns out to be better.
 
-        if game_end:  # No valid moves, return heuristic as is (Case if parent is win/loss condition)
-            return (None, board_heuristic)
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - depth: int | number of plies left to search below this node
+        - alpha: float | score the player to move is already guaranteed
+        - beta: float | score above which the opponent avoids this node
+        - ply: int | distance from the root of the search
+    Returns:
+        - best_move: the best encoded move from this node (None at leaves)
+        - best_value: the negamax value of the node
+    """
+    def alpha_beta(self, game_state, depth, alpha, beta, ply=0):
+        metrics = self.metrics
+        #Captured king (game over): evaluate the board as is
+        if None in game_state["kings"]:
+            metrics.leaf_nodes += 1
+            return (None, self.evaluate_for_turn(game_state))
+        #Few pieces left: the endgame tablebases answer the node exactly (except at the root, which must return a move)
+        if self.tablebases is not None and ply > 0 and game_state["pieces"] <= TABLEBASE_MAX_PIECES:
+            score = self.probe_tablebases(game_state, ply)
+            if score is not None:
+                metrics.leaf_nodes += 1
+                metrics.tablebase_hits += 1
+                return (None, score)
+        #Horizon reached: resolve pending captures and promotions before trusting the evaluation
+        if depth == 0:
+            metrics.leaf_nodes += 1
+            if self.use_quiescence:
+                return (None, self.quiescence(game_state, alpha, beta, ply))
+            return (None, self.evaluate_for_turn(game_state))
+
+        #Probe the transposition table. An entry searched at least as deep as this node can answer it directly
+        #(except at the root, which must return a move); otherwise its best move is tried first
+        tt_key = game_state["hash"] ^ ZOBRIST_HEURISTIC[self.heuristic]
+        tt_entry = self.transposition_table.probe(tt_key)
+        metrics.tt_probes += 1
+        tt_move = None
+        if tt_entry is not None:
+            metrics.tt_hits += 1
+            tt_depth, tt_score, tt_bound, tt_move = tt_entry
+            if tt_depth >= depth and ply > 0:
+                if tt_bound == TT_EXACT or (tt_bound == TT_LOWER and tt_score >= beta) or (tt_bound == TT_UPPER and tt_score <= alpha):
+                    metrics.tt_cutoffs += 1
+                    metrics.leaf_nodes += 1
+                    return (tt_move, tt_score)
+
+        #Without a stored move, fall back on the principal variation of the previous iteration
+        if tt_move is None and ply < len(self.principal_variation):
+            tt_move = self.principal_variation[ply]
+        MoveList = self.order_moves(game_state, self.generate_moves(game_state), ply, tt_move)
 
-        #initialize tracking variables for stats
-        if not hasattr(self, "total_states_explored"):
-            self.total_states_explored = 0
-            self.depth_exploration_stats = {}
         #update the total number of states explored
         self.total_states_explored += 1
+        metrics.interior_nodes += 1
 
         #update the depth exploration stats
-        if current_depth not in self.depth_exploration_stats:
-            self.depth_exploration_stats[current_depth] = 0
-        self.depth_exploration_stats[current_depth] += 1
-
-        if current_depth % 2 == 1:  # Max node (AI's turn)
-            current_best_heuristic = alpha
-        else:  # Min node (Opponent's turn)
-            current_best_heuristic = beta
-        current_best_move = None #first move by default
-        current_Alpha = alpha
-        current_Beta = beta
-        # Loop start to evaluate children
+        if ply + 1 not in self.depth_exploration_stats:
+            self.depth_exploration_stats[ply + 1] = 0
+        self.depth_exploration_stats[ply + 1] += 1
+
+        original_alpha = alpha
+        best_value = -math.inf
+        best_move = None
         for move in MoveList:
-            if (time.perf_counter() - self.AI_Start_Time) + 0.00005 > self.AI_time_out:
-                return current_best_move,current_best_heuristic  # Return the best move found so far
-            move = self.parse_input_v2(move) # ((A,2),(B,2)) => ((3,0),(
-            # Will do recursion to go to children for internal nodes
-            if current_depth < self.depth:  # If we're not at the max depth then go one layer down by simulating the move
-                original_piece,captured_piece, game_state = self.simulate_make_move(game_state, move)
-                results = self.alpha_beta(game_state, current_depth + 1, current_Alpha, current_Beta)
-                if (current_depth % 2) == 1 and results[1] > current_best_heuristic: # parent is a max node | AI's turn | we're looking for the max
-                    current_best_heuristic = results[1]
-                    current_best_move = move
-                    current_Alpha = results[1]
-                    game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece) # Restore board history
-                    if current_Alpha >= current_Beta: break  # PRUNE SIBLINGS
-                    continue # Evaluate next move
-                elif (current_depth % 2) == 0 and results[1] < current_best_heuristic: # parent is a min node | opponent's turn | we're looking for the minimum
-                    current_best_heuristic = results[1]
-                    current_best_move = move
-                    current_Beta = results[1]
-                    game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece) # Restore board history
-                    if current_Alpha >= current_Beta: break  # PRUNE SIBLINGS
-                    continue # Evaluate next move
-                game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece)  # Restore board history
-                continue
+            #Stop when the time is up: search_timed_out keeps the partial results out of the transposition table
+            self.deadline_countdown -= 1
+            if self.deadline_countdown <= 0 and self.check_deadline():
+                break
+            original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
+            if best_move is None:
+                value = -self.alpha_beta(game_state, depth - 1, -beta, -alpha, ply + 1)[1]
+            else:
+                #Null window: only prove that the move is not better than alpha
+                value = -self.alpha_beta(game_state, depth - 1, -alpha - PVS_WINDOW, -alpha, ply + 1)[1]
+                if alpha < value < beta and not self.search_timed_out:
+                    value = -self.alpha_beta(game_state, depth - 1, -beta, -alpha, ply + 1)[1]
+            game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece) # Restore board history
+            if self.search_timed_out:
+                break # the value of an interrupted child is meaningless
+            if value > best_value:
+                best_value = value
+                best_move = move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:  # PRUNE SIBLINGS
+                        metrics.cutoffs += 1
+                        if move == MoveList[0]:
+                            metrics.first_move_cutoffs += 1
+                        self.record_cutoff(game_state, move, ply, depth)
+                        break
+
+        if best_move is None:
+            #Interrupted before any move was searched
+            return (None, best_value if MoveList else self.evaluate_for_turn(game_state))
+
+        #Remember the result with the bound type implied by the window
+        if not self.search_timed_out:
+            if best_value <= original_alpha:
+                bound = TT_UPPER
+            elif best_value >= beta:
+                bound = TT_LOWER
+            else:
+                bound = TT_EXACT
+            self.transposition_table.store(tt_key, depth, best_value, bound, best_move)
+        return best_move, best_value
 
-            ##START OF EVALUATING EXTERNAL NODES
-            move_heuristic = board_heuristic
-            end_row, end_col = move[1]
-            if (current_depth % 2) == 1 : # parent is a max node | AI's turn | we're looking for the max
-                original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
-                ignore, move_heuristic = self.evaluate_board(game_state)
-                game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece)  # Restore board history
-                # if game_state["board"][end_row][end_col] != ".":
-                #     value = piece_values[game_state["board"][end_row][end_col][1]]
-                #     move_heuristic -= value if game_state["board"][end_row][end_col][0] == "w" else -value
-                #     # Compensate diff for pawn promotion
-                #     if game_state["board"][end_row][end_col] == "wp" and end_row == 0: move_heuristic += 8
-                #     if game_state["board"][end_row][end_col] == "bp" and end_row == 5: move_heuristic -= 8
-
-                if move_heuristic > current_best_heuristic:
-                    current_best_heuristic = move_heuristic
-                    current_best_move = move
-                    current_Alpha = current_best_heuristic
-            else : # parent is a min node | opponent's turn | we're looking for the minimum
-                original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
-                ignore, move_heuristic = self.evaluate_board(game_state)
-                game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece)  # Restore board history
-
-                # if game_state["board"][end_row][end_col] != ".":
-                #     value = piece_values[game_state["board"][end_row][end_col][1]]
-                #     move_heuristic -= value if game_state["board"][end_row][end_col][0] == "w" else -value
-                #     # Compensate diff for pawn promotion
-                #     if game_state["board"][end_row][end_col] == "wp" and end_row==0: move_heuristic += 8
-                #     if game_state["board"][end_row][end_col] == "bp" and end_row == 5: move_heuristic -= 8
-
-                if move_heuristic < current_best_heuristic:
-                    current_best_heuristic = move_heuristic
-                    current_best_move = move
-                    current_Beta = current_best_heuristic
-
-            if current_Alpha >= current_Beta: break  # PRUNE SIBLINGS
-        return current_best_move, current_best_heuristic
-
-    """
-    AI minimax function. Recursively expands the game tree from the given current_depth 
-    and finds the best move to be performed by the AI.
+    """
+    Looks a search node up in the endgame tablebases. Without a capture since the root, the plies left before the
+    draw rule are known exactly; after one, they lie between those of a capture at ply 1 and one at this ply.
 
     Args:
         - game_state: dictionary | Dictionary representing the current game state
-        - current_depth: integer value representing the current depth of the game tree being explored
+        - ply: int | distance from the root of the search
     Returns:
-        - best_move: the best move from the current board state after developing the full game tree
-        - best_value: the heuristic value of the best move to be taken 
+        - float | negamax score from the tablebases, or None when they cannot answer the node
     """
-    def minimax(self, game_state, current_depth):
-        # Initialize tracking variables for stats
-        if not hasattr(self, "total_states_explored"):
-            self.total_states_explored = 0
-            self.depth_exploration_stats = {}
+    def probe_tablebases(self, game_state, ply):
+        if game_state["pieces"] == self.root_pieces:
+            min_budget = max_budget = self.draw_budget - ply
+        else:
+            min_budget = FRESH_DRAW_BUDGET[WHITE] - ply + 1
+            max_budget = FRESH_DRAW_BUDGET[BLACK]
+        return self.tablebases.probe(game_state, min_budget, max_budget)
+
+    """
+    Quiescence search run by alpha_beta at its horizon. Only captures (king captures included) and pawn promotions are
+    searched, until the position is quiet. The player to move may also stand pat, i.e. keep the static evaluation
+    instead of making a tactical move, which bounds the node from below and ends the search when it is already >= beta.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - alpha: float | score the player to move is already guaranteed
+        - beta: float | score above which the opponent avoids this node
+        - ply: int | distance from the root of the search
+    Returns:
+        - best_value: the negamax value of the node
+    """
+    def quiescence(self, game_state, alpha, beta, ply):
+        #Stop when the time is up, alpha_beta discards the value
+        self.deadline_countdown -= 1
+        if self.deadline_countdown <= 0 and self.check_deadline():
+            return 0
+        #update the number of states explored, quiescence nodes included
+        self.total_states_explored += 1
+        self.metrics.quiescence_nodes += 1
+        if ply + 1 not in self.depth_exploration_stats:
+            self.depth_exploration_stats[ply + 1] = 0
+        self.depth_exploration_stats[ply + 1] += 1
+
+        stand_pat = self.evaluate_for_turn(game_state)
+        if None in game_state["kings"] or stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        best_value = stand_pat
+        for move in self.order_moves(game_state, self.tactical_moves(game_state), ply, None):
+            original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
+            value = -self.quiescence(game_state, -beta, -alpha, ply + 1)
+            game_state = self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
+            if self.search_timed_out:
+                break
+            if value > best_value:
+                best_value = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.metrics.qsearch_cutoffs += 1
+                        break
+        return best_value
+
+    """
+    Selects the moves searched by quiescence: captures and pawn promotions
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - list | the encoded captures and promotions of the player to move
+    """
+    def tactical_moves(self, game_state):
+        board = game_state["board"]
+        tactical = []
+        for move in self.generate_moves(game_state):
+            end_row, end_col = SQUARE_COORDS[(move & MOVE_SQUARES) % 25]
+            if board[end_row][end_col] != "." or move & MOVE_PROMOTION:
+                tactical.append(move)
+        return tactical
+
+    """
+    Starts the clock reads of a new search: the first read comes after DEADLINE_CHECK_NODES[0] nodes and the interval
+    is adapted from there, nothing is carried over from the previous search
+
+    Args:
+        - None
+    Returns:
+        - None
+    """
+    def reset_deadline(self):
+        self.deadline_interval = self.deadline_countdown = self.deadline_nodes = DEADLINE_CHECK_NODES[0]
+        self.deadline_checked = time.perf_counter()
+
+    """
+    Reads the clock for the search, called by alpha_beta, quiescence and minimax once deadline_countdown nodes were
+    searched since the last read. The number of nodes until the next read is set from the speed measured since the
+    last read (growing at most twofold per read), so the clock is read about every DEADLINE_CHECK_PERIOD seconds
+    whatever the speed of the search.
+
+    Args:
+        - None
+    Returns:
+        - bool | True when the search must stop: AI_time_out is exceeded or stop_flag is set (search_timed_out is set)
+    """
+    def check_deadline(self):
+        now = time.perf_counter()
+        elapsed = now - max(self.deadline_checked, self.AI_Start_Time)
+        if elapsed > 0:
+            interval = int((self.deadline_nodes - self.deadline_countdown) * DEADLINE_CHECK_PERIOD / elapsed)
+            self.deadline_interval = min(max(interval, DEADLINE_CHECK_NODES[0]), 2 * self.deadline_interval,
+                                         DEADLINE_CHECK_NODES[1])
+        self.deadline_checked = now
+        #Never let the next read come after the deadline
+        remaining = self.AI_time_out - (now - self.AI_Start_Time)
+        self.deadline_countdown = self.deadline_interval if remaining > DEADLINE_CHECK_PERIOD else DEADLINE_CHECK_NODES[0]
+        self.deadline_nodes = self.deadline_countdown
+        if remaining <= 0 or (self.stop_flag is not None and self.stop_flag.value):
+            self.search_timed_out = True
+            return True
+        return False
+
+    """
+    AI minimax function, kept as a reference for alpha_beta. Expands the full game tree to the given depth without
+    pruning, ordering or transposition table, using the same negamax convention.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - depth: int | number of plies left to search below this node
+        - ply: int | distance from the root of the search
+    Returns:
+        - best_move: the best encoded move from the current board state after developing the full game tree
+        - best_value: the negamax value of the best move to be taken
+    """
+    def minimax(self, game_state, depth, ply=0):
+        # Stop when the time is up, the parent discards the value
+        self.deadline_countdown -= 1
+        if self.deadline_countdown <= 0 and self.check_deadline():
+            return (None, 0)
 
         # Update the total number of states explored
         self.total_states_explored += 1
 
         # Update the depth exploration stats
-        if current_depth not in self.depth_exploration_stats:
-            self.depth_exploration_stats[current_depth] = 0
-        self.depth_exploration_stats[current_depth] += 1
+        if ply + 1 not in self.depth_exploration_stats:
+            self.depth_exploration_stats[ply + 1] = 0
+        self.depth_exploration_stats[ply + 1] += 1
+
+        # Terminal condition: a king was captured or we reached the maximum depth
+        if depth == 0 or None in game_state["kings"]:
+            self.metrics.leaf_nodes += 1
+            return (None, self.evaluate_for_turn(game_state))
+        self.metrics.interior_nodes += 1
+
+        best_value = -math.inf
+        best_move = None
+        for move in self.generate_moves(game_state):
+            # Simulate the move (modifies game_state in place)
+            original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
 
-        # Get the list of valid moves and evaluate the current board
-        MoveList = self.valid_moves(game_state)
-        current_board_value = self.evaluate_board(game_state)
+            # Recursively evaluate the resulting board state, from the opponent's point of view
+            value = -self.minimax(game_state, depth - 1, ply + 1)[1]
+
+            # Undo the move to restore the original state
+            self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
+
+            # The value of an interrupted subtree is meaningless, the moves searched before it give the result
+            if self.search_timed_out:
+                break
+
+            # Update if this move is better than previously seen moves
+            if value > best_value:
+                best_value = value
+                best_move = move
+
+        return (best_move, best_value)
+
+    """
+    Sorts the valid moves for the search: hash/PV move first, then captures by most valuable victim / least valuable
+    attacker (king captures first), promotions, the killer moves of the ply and finally quiet moves by history score
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - MoveList: list | encoded moves as returned by generate_moves
+        - ply: int | distance from the root of the search
+        - tt_move: int | move from the transposition table or principal variation, or None
+    Returns:
+        - list | the encoded moves, best candidates first
+    """
+    def order_moves(self, game_state, MoveList, ply, tt_move):
+        board = game_state["board"]
+        killers = self.killer_moves[ply] if ply < len(self.killer_moves) else ()
+        history = self.history
+        scored = []
+        for move in MoveList:
+            start, end = divmod(move & MOVE_SQUARES, 25)
+            start_row, start_col = SQUARE_COORDS[start]
+            end_row, end_col = SQUARE_COORDS[end]
+            piece = board[start_row][start_col]
+            victim = board[end_row][end_col]
+            if move == tt_move:
+                score = ORDER_HASH_MOVE
+            elif victim != ".":
+                score = ORDER_CAPTURE + 10 * PIECE_VALUES[victim[1]] - PIECE_VALUES[piece[1]]
+            elif move & MOVE_PROMOTION:
+                score = ORDER_PROMOTION
+            elif move in killers:
+                score = ORDER_KILLER - killers.index(move)
+            else:
+                score = history.get((piece, end), 0)
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    """
+    Remembers a quiet move that caused a cutoff as a killer move of its ply and raises its history score.
+    Called after the move was undone, so the board shows the position before the move.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - move: int | the encoded move that caused the cutoff
+        - ply: int | distance from the root of the search
+        - remaining_depth: int | depth searched below the node, deeper cutoffs weigh more
+    Returns:
+        - None
+    """
+    def record_cutoff(self, game_state, move, ply, remaining_depth):
+        start, end = divmod(move & MOVE_SQUARES, 25)
+        start_row, start_col = SQUARE_COORDS[start]
+        end_row, end_col = SQUARE_COORDS[end]
+        board = game_state["board"]
+        piece = board[start_row][start_col]
+        if board[end_row][end_col] != "." or move & MOVE_PROMOTION:
+            return
+        while len(self.killer_moves) <= ply:
+            self.killer_moves.append([])
+        killers = self.killer_moves[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (piece, end)
+        self.history[key] = min(self.history.get(key, 0) + remaining_depth * remaining_depth, ORDER_KILLER - 10)
 
-        # Terminal condition: No moves available(win, loss or draw) or reached maximum depth
-        #TODO: make sure the valid_moves is empty after a draw, win or loss??
+    """
+    Iterative deepening driver for alpha-beta. Searches depth 1, 2, 3, ... until the time budget (AI_time_out) runs out,
+    the max_depth is reached or a king capture is found. No iteration starts once SOFT_TIME_FRACTION of the budget is
+    spent; an iteration cut short by the timeout is discarded, the move of the last completed iteration is returned. Each iteration is ordered by the transposition table and the principal
+    variation of the previous one, and searched with an aspiration window around the previous score.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - depth_offset: int | plies added to every iteration (used by Lazy SMP helpers)
+    Returns:
+        - best_move: the best encoded move found by the last completed iteration
+        - best_value: the negamax value of that move (point of view of the player to move)
+    """
+    def iterative_deepening(self, game_state, depth_offset=0):
+        self.principal_variation = []
+        self.completed_depth = 0
+        #Killers belong to this search, history carries over from the previous move with less weight
+        self.killer_moves = []
+        for key in self.history:
+            self.history[key] //= 2
+        best_results = (None, 0)
+        self.reset_deadline()
+        for depth in range(1 + depth_offset, self.max_depth + 1):
+            #Past the soft limit the next iteration would not complete, keep the time
+            if best_results[0] is not None and time.perf_counter() - self.AI_Start_Time > self.AI_time_out * SOFT_TIME_FRACTION:
+                break
+            self.depth = depth
+            self.search_timed_out = False
+            iteration_start = time.perf_counter()
+            iteration_nodes = self.total_states_explored
+            #minimax ignores the window, so it always searches with the full one
+            results = self.aspiration_search(game_state, depth, best_results[1] if depth > 1 and self.algorithm else None)
+            self.metrics.iterations.append({"depth": depth, "time": time.perf_counter() - iteration_start,
+                                            "nodes": self.total_states_explored - iteration_nodes,
+                                            "score": results[1], "completed": not self.search_timed_out})
+            if self.search_timed_out:
+                #A partial first iteration is still better than no move at all
+                if best_results[0] is None:
+                    best_results = results
+                break
+            best_results = results
+            self.completed_depth = depth
+            self.principal_variation = self.extract_principal_variation(game_state, depth)
+            if self.iteration_callback is not None:
+                self.iteration_callback(depth, results[0], results[1])
+            if abs(results[1]) >= KING_CAPTURE_SCORE:
+                break
+        return best_results
+
+    """
+    Searches the root with a narrow window around the score of the previous iteration. When the score falls outside
+    the window, the search is repeated with a window widened on that side until the score fits.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - depth: int | depth of the iteration
+        - guess: float | score of the previous iteration, None to search with the full window
+    Returns:
+        - best_move, best_value | result of alpha_beta at the root
+    """
+    def aspiration_search(self, game_state, depth, guess):
+        if guess is None or abs(guess) >= KING_CAPTURE_SCORE:
+            return self.search_root(game_state, depth, -SEARCH_INFINITY, SEARCH_INFINITY)
+        delta = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            results = self.search_root(game_state, depth, alpha, beta)
+            if self.search_timed_out:
+                return results
+            if results[1] <= alpha:
+                alpha = results[1] - delta
+            elif results[1] >= beta:
+                beta = results[1] + delta
+            else:
+                return results
+            delta *= 4
+            if delta >= KING_CAPTURE_SCORE:
+                alpha, beta = -SEARCH_INFINITY, SEARCH_INFINITY
+
+    """
+    Searches the root with the selected algorithm, in this process or split across the process pool when workers > 1
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - depth: int | depth of the search
+        - alpha: float | lower bound of the root window (alpha-beta only)
+        - beta: float | upper bound of the root window (alpha-beta only)
+    Returns:
+        - best_move, best_value | result of the root search
+    """
+    def search_root(self, game_state, depth, alpha, beta):
+        if self.workers > 1:
+            return self.parallel_root_search(game_state, depth, alpha, beta)
+        if self.algorithm:
+            return self.alpha_beta(game_state, depth, alpha, beta, 0)
+        return self.minimax(game_state, depth)
+
+    """
+    Distributes the root moves over a pool of worker processes (see search_root_move). The workers share the best
+    root score found so far, so later moves are searched with a tighter alpha. Their node counts and
+    depth_exploration_stats are merged into this instance. With alpha-beta the first move is searched before the
+    others are dispatched, so every worker starts from its score.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - depth: int | depth of the root search
+        - alpha: float | lower bound of the root window
+        - beta: float | upper bound of the root window
+    Returns:
+        - best_move: the best encoded root move
+        - best_value: its negamax value
+    """
+    def parallel_root_search(self, game_state, depth, alpha=-SEARCH_INFINITY, beta=SEARCH_INFINITY):
+        self.total_states_explored += 1
+        self.depth_exploration_stats[1] = self.depth_exploration_stats.get(1, 0) + 1
+
+        pv_move = self.principal_variation[0] if self.principal_variation else None
+        MoveList = self.order_moves(game_state, self.generate_moves(game_state), 0, pv_move)
         if not MoveList:
-            return (None, current_board_value)
-        if current_depth == self.depth:
-            return (None, current_board_value)
-
-        # Determine if this is a max node/white's turn or a min node/black's turn
-        if current_depth % 2 == 1:  # Max node (turn = white)
-            best_value = -math.inf
-            best_move = None
-            for move in MoveList:
-                # Convert move to internal format
-                move = self.parse_input_v2(move)
-
-                # Simulate the move (modifies game_state in place)
-                original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
-
-                # Recursively evaluate the resulting board state
-                _, child_value = self.minimax(game_state, current_depth + 1)
-
-                # Undo the move to restore the original state
-                self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
-
-                # Update if this move is better than previously seen moves
-                if child_value > best_value:
-                    best_value = child_value
-                    best_move = move
-
-            return (best_move, best_value)
-        else:  # Min node (black = turn)
-            best_value = math.inf
-            best_move = None
-            for move in MoveList:
-                move = self.parse_input_v2(move)
-                original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
-                _, child_value = self.minimax(game_state, current_depth + 1)
-                self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
-
-                # Update if this move is lower than previously seen moves
-                if child_value < best_value:
-                    best_value = child_value
-                    best_move = move
-
-            return (best_move, best_value)
+            return (None, self.evaluate_for_turn(game_state))
+
+        if self.search_pool is None:
+            self.search_pool_bound = multiprocessing.Value("d", 0.0)
+            self.search_pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_search_worker,
+                                                   initargs=(self.search_pool_bound,))
+        self.search_pool_bound.value = alpha
+        settings = {"algorithm": self.algorithm, "heuristic": self.heuristic, "move_generator": self.move_generator,
+                    "use_quiescence": self.use_quiescence}
+        deadline = time.time() + self.AI_time_out - (time.perf_counter() - self.AI_Start_Time)
+        #The first (best ordered) move is searched alone so the other moves start with its score as alpha
+        futures = [self.search_pool.submit(search_root_move, game_state, MoveList[0], depth, beta, deadline, settings)]
+        if self.algorithm:
+            futures[0].result()
+        futures += [self.search_pool.submit(search_root_move, game_state, move, depth, beta, deadline, settings)
+                    for move in MoveList[1:]]
+
+        #A move searched against a bound it did not beat only has an upper bound as value: prefer moves with exact values
+        best_move = None
+        best_key = None
+        for move, future in zip(MoveList, futures):
+            value, searched_alpha, nodes, stats, timed_out = future.result()
+            self.total_states_explored += nodes
+            for level, count in stats.items():
+                self.depth_exploration_stats[level] = self.depth_exploration_stats.get(level, 0) + count
+            if timed_out:
+                self.search_timed_out = True
+                continue
+            key = (value > searched_alpha or not self.algorithm, value)
+            if best_key is None or key > best_key:
+                best_key = key
+                best_move = move
+        if best_move is None:
+            return (None, -math.inf)
+
+        if self.algorithm and not self.search_timed_out:
+            best_value = best_key[1]
+            bound = TT_UPPER if best_value <= alpha else TT_LOWER if best_value >= beta else TT_EXACT
+            self.transposition_table.store(game_state["hash"] ^ ZOBRIST_HEURISTIC[self.heuristic], depth, best_value,
+                                           bound, best_move)
+        return best_move, best_key[1]
+
+    """
+    Lazy SMP search: smp_helpers processes run their own iterative deepening of the same root (see smp_helper_search)
+    while this process runs the main one. All of them share one SharedTranspositionTable, so the helpers' results
+    answer or order the main search. The move of the main search is returned as soon as its iterative deepening ends;
+    the helpers are then stopped and their node counts merged.
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - best_move, best_value | result of the main iterative deepening
+    """
+    def lazy_smp_search(self, game_state):
+        if self.smp_pool is None:
+            if not isinstance(self.transposition_table, SharedTranspositionTable):
+                self.transposition_table = SharedTranspositionTable(entries=self.transposition_table.size)
+            self.smp_stop_flag = multiprocessing.RawValue("b", 0)
+            self.smp_pool = ProcessPoolExecutor(max_workers=self.smp_helpers, initializer=init_smp_helper,
+                                                initargs=(self.transposition_table, self.smp_stop_flag))
+        self.smp_stop_flag.value = 0
+        settings = {"algorithm": self.algorithm, "heuristic": self.heuristic, "move_generator": self.move_generator,
+                    "max_depth": self.max_depth, "use_quiescence": self.use_quiescence}
+        deadline = time.time() + self.AI_time_out - (time.perf_counter() - self.AI_Start_Time)
+        helpers = [self.smp_pool.submit(smp_helper_search, game_state, helper, deadline, settings)
+                   for helper in range(1, self.smp_helpers + 1)]
+
+        results = self.iterative_deepening(game_state)
+
+        self.smp_stop_flag.value = 1
+        for helper in helpers:
+            nodes, stats, _ = helper.result()
+            self.total_states_explored += nodes
+            for level, count in stats.items():
+                self.depth_exploration_stats[level] = self.depth_exploration_stats.get(level, 0) + count
+        return results
+
+    """
+    Shuts down the root-split workers and the Lazy SMP helpers and frees the shared transposition table, to be called
+    once the instance is done searching (the game modes end with exit). The table is replaced by a private one of the
+    same size, so the instance can still search; a later parallel search creates its pool (and shared table) again.
+
+    Args:
+        - None
+    Returns:
+        - None
+    """
+    def close(self):
+        if self.search_pool is not None:
+            self.search_pool.shutdown(cancel_futures=True)
+            self.search_pool = None
+            self.search_pool_bound = None
+        if self.smp_pool is not None:
+            self.smp_stop_flag.value = 1
+            self.smp_pool.shutdown(cancel_futures=True)
+            self.smp_pool = None
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            table = self.transposition_table
+            self.transposition_table = TranspositionTable(entries=table.size)
+            table.close()
+
+    """
+    Follows the best moves stored in the transposition table from the given position
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+        - max_length: int | maximum number of moves to follow
+    Returns:
+        - list | the encoded moves of the principal variation
+    """
+    def extract_principal_variation(self, game_state, max_length):
+        line = []
+        undo = []
+        while len(line) < max_length:
+            entry = self.transposition_table.probe(game_state["hash"] ^ ZOBRIST_HEURISTIC[self.heuristic])
+            if entry is None or entry[3] is None or entry[3] not in self.generate_moves(game_state):
+                break
+            move = entry[3]
+            original_piece, captured_piece, game_state = self.simulate_make_move(game_state, move)
+            line.append(move)
+            undo.append((move, captured_piece, original_piece))
+            if captured_piece[1:] == "K":
+                break
+        for move, captured_piece, original_piece in reversed(undo):
+            self.simulate_unmake_move(game_state, move, captured_piece, original_piece)
+        return line
+
+    """
+    Looks the position up in the opening book
+
+    Args:
+        - game_state: dictionary | Dictionary representing the current game state
+    Returns:
+        - tuple | (best_move, best_value) stored in the book for the current heuristic, or None when the book has no
+          valid move for the position or was built with the other algorithm
+    """
+    def probe_opening_book(self, game_state):
+        if self.opening_book is None or self.opening_book.algorithm != ("alpha-beta" if self.algorithm else "minimax"):
+            return None
+        entry = self.opening_book.probe(game_state["hash"] ^ ZOBRIST_HEURISTIC[self.heuristic])
+        if entry is None or entry[0] not in self.generate_moves(game_state):
+            return None
+        self.principal_variation = [entry[0]]
+        self.completed_depth = 0
+        return entry
 
     """
     Return the best move to be performed by the AI after running either minimax or alpha-beta algorithms.
@@ -883,32 +2964,60 @@ class MiniChess:
         - eval_time: the time taken to find the best move using the algorithm chosen
     """
     def AI_makeMove(self, game_state, turn):
-        #Determine the starting depth based on the AI's turn
-        revertDepth = False
-        if turn == "white":
-            start_depth = 1
-        else:
-            start_depth = 2
-            self.depth += 1
-            revertDepth = True
-
-        if self.algorithm:
-            self.AI_Start_Time = time.perf_counter() #starting a timer before the algorithm method is called
-            results = self.alpha_beta(game_state,start_depth,-15000,15000)
-            end = time.perf_counter() #ending the timer once the algorithm finishes execution
-        else:
-            self.AI_Start_Time = time.perf_counter()
-            results = self.minimax(game_state,start_depth)
-            end = time.perf_counter()
-
-        if revertDepth:
-            self.depth -= 1
-            revertDepth = False
+        #The search relies on the hash and evaluation terms of the game state
+        self.refresh_game_state(game_state)
+        configured_depth = self.depth
+        self.draw_budget = draw_budget(self.turn_counter, self.turn_with_piece_taken, WHITE if turn == "white" else BLACK)
+        self.root_pieces = game_state["pieces"]
+        self.metrics = SearchMetrics()
+        nodes_before = self.total_states_explored
+        self.reset_deadline()
+
+        #The search frees its garbage by reference counting: a cyclic collection pause (tens of ms over the table
+        #and cache entries that survived) would only eat into the time budget, so it waits until the move is timed
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            book_entry = self.probe_opening_book(game_state)
+            if book_entry is not None:
+                self.AI_Start_Time = time.perf_counter()
+                results = book_entry
+                end = time.perf_counter()
+            elif self.algorithm or self.depth is None:
+                #alpha-beta, or minimax without a fixed depth: deepen iteratively until the time runs out
+                self.AI_Start_Time = time.perf_counter() #starting a timer before the algorithm method is called
+                if self.algorithm and self.smp_helpers > 0:
+                    results = self.lazy_smp_search(game_state)
+                else:
+                    results = self.iterative_deepening(game_state)
+                end = time.perf_counter() #ending the timer once the algorithm finishes execution
+            else:
+                self.AI_Start_Time = time.perf_counter()
+                self.search_timed_out = False
+                results = self.search_root(game_state, configured_depth, -SEARCH_INFINITY, SEARCH_INFINITY)
+                end = time.perf_counter()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        self.depth = configured_depth
         #Computing the evalutation time to find the best move
         eval_time = round(end - self.AI_Start_Time, 7)
-        #Storing the best move found by the algorithm chosen
+        self.metrics.elapsed = end - self.AI_Start_Time
+        self.metrics.nodes = self.total_states_explored - nodes_before
+        if self.metrics_writer is not None:
+            self.metrics_writer.write(self.metrics.to_json() + "\n")
+        #Storing the best move found by the algorithm chosen, with the score from white's point of view like evaluate_board
         best_move = results[0]
-        heuristic_score = results[1]
+        heuristic_score = results[1] if turn == "white" else -results[1]
+        #Never hand back an empty move, even if not a single iteration could run
+        if best_move is None:
+            MoveList = self.generate_moves(game_state)
+            if MoveList:
+                best_move = MoveList[0]
+        #Converting the encoded move to board coordinates for the game loop
+        if best_move is not None:
+            best_move = self.decode_move(best_move)
         #returns the best move found using either alpha-beta or minimax algorithm and the time taken to find that move
         result_info = best_move, eval_time, heuristic_score
         return result_info
@@ -949,13 +3058,13 @@ class MiniChess:
                         algorithm = input("Incorrect input! Please try again: ")   
                         continue
                     self.log_filename = f"gameTrace-{algorithm}-{timeout}-{max_turns}.txt"
-                    with open(self.log_filename, "w") as file:
-                        file.write("NEW GAME START!\n\nGAME PARAMETERS:\n")
-                        file.write("Timeout = 5\nMax Number of Turns = 100\nPlay Mode = H-H")
-                        file.write("\n\nInitial configuration:\n")
-                        for i, row in enumerate(self.current_game_state["board"], start=1):
-                            file.write(str(6 - i) + "  " + ' '.join(piece.rjust(3) for piece in row))
-                            file.write("\n")
+                    trace = self.open_trace("w")
+                    trace.write("NEW GAME START!\n\nGAME PARAMETERS:\n")
+                    trace.write("Timeout = 5\nMax Number of Turns = 100\nPlay Mode = H-H")
+                    trace.write("\n\nInitial configuration:\n")
+                    for i, row in enumerate(self.current_game_state["board"], start=1):
+                        trace.write(str(6 - i) + "  " + ' '.join(piece.rjust(3) for piece in row))
+                        trace.write("\n")
                     self.ai_vs_h(timeout, max_turns)
                 exit(1)
             elif game_mode == "3":
@@ -1031,8 +3140,7 @@ class MiniChess:
                 print("Players draw... ending game")
                 exit(1)
             if self.turn_counter>int(max_turns):
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
                 print("Max turn reached... ending game")
                 exit(1)
             #Asking the user for their move input
@@ -1083,13 +3191,11 @@ class MiniChess:
 
             if win_condition == "White King captured! Black wins!":
                 print(win_condition)
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
             elif win_condition == "Black King captured! White wins!":
                 print(win_condition)
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
 
     """
@@ -1105,6 +3211,8 @@ class MiniChess:
         #Checking the algorithm chosen by the user
         if self.algorithm: alg = "Alpha-Beta"
         else: alg = "Minimax"
+        #Letting the AI search for most of the timeout
+        self.AI_time_out = search_time_budget(float(timeout))
         #Printing the initial game information and initial board configuration
         print()
         print("-------------------------------------------------------------------")
@@ -1119,8 +3227,7 @@ class MiniChess:
                 print("Players draw... ending game")
                 exit(1)
             if self.turn_counter>int(max_turns):
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
                 print("Max turn reached... ending game")
                 exit(1)
             print(f"{self.current_game_state['turn'].capitalize()} to move: ")
@@ -1190,13 +3297,11 @@ class MiniChess:
 
             if win_condition == "White King captured! Black wins!":
                 print(win_condition)
-                with open(self.log_filename, "a") as file:
-                    file.write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
             elif win_condition == "Black King captured! White wins!":
                 print(win_condition)
-                with open(self.log_filename, "a") as file:
-                    file.write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
 
     """
@@ -1212,6 +3317,8 @@ class MiniChess:
         #Checking the algorithm chosen by the user
         if self.algorithm: alg = "Alpha-Beta"
         else: alg = "Minimax"
+        #Letting the AI search for most of the timeout
+        self.AI_time_out = search_time_budget(float(timeout))
         #Printing the initial game information and initial board configuration
         print()
         print("-------------------------------------------------------------------")
@@ -1226,8 +3333,7 @@ class MiniChess:
                 print("Players draw... ending game")
                 exit(1)
             if self.turn_counter>int(max_turns):
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
                 print("Max turn reached... ending game")
                 exit(1)
             print(f"{self.current_game_state['turn'].capitalize()} to move: ")
@@ -1285,13 +3391,11 @@ class MiniChess:
 
             if win_condition == "White King captured! Black wins!":
                 print(win_condition)
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
             elif win_condition == "Black King captured! White wins!":
                 print(win_condition)
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
 
 
@@ -1308,6 +3412,8 @@ class MiniChess:
         #Checking the algorithm chosen by the user
         if self.algorithm: alg = "Alpha-Beta"
         else: alg = "Minimax"
+        #Letting the AI search for most of the timeout
+        self.AI_time_out = search_time_budget(float(timeout))
         #Printing the initial game information and initial board configuration
         print()
         print("-------------------------------------------------------------------")
@@ -1322,8 +3428,7 @@ class MiniChess:
                 print("Players draw... ending game")
                 exit(1)
             if self.turn_counter>int(max_turns):
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nTurn limit reached at " + str(self.turn_counter - 1) + " turns")
                 print("Max turn reached... ending game")
                 exit(1)
             print(f"{self.current_game_state['turn'].capitalize()} to move: ")
@@ -1377,17 +3482,654 @@ class MiniChess:
 
             if win_condition == "White King captured! Black wins!":
                 print(win_condition)
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nWhite King captured! Black wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
             elif win_condition == "Black King captured! White wins!":
                 print(win_condition)
-                with open(self.log_filename.txt, "a") as file:
-                    file.write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
+                self.trace_writer().write("\nBlack King captured! White wins after " + str(self.turn_counter - 1) + " turns")
                 exit(1)
 
+"""
+Result of Engine.search: the best move and its score, the nodes explored, the principal variation and search statistics
+"""
+SearchResult = namedtuple("SearchResult", ["move", "score", "nodes", "pv", "stats"])
+
+class Engine:
+    """
+    Embeddable search engine without prompts, console output or trace files. The search state (timer, depth,
+    transposition table, killers and history) lives in a MiniChess instance used only for searching, which is kept
+    between calls so consecutive searches of a game reuse its tables.
+    """
+    __slots__ = ("core",)
+
+    def __init__(self, heuristic=2, algorithm="alpha-beta", move_generator="tables", transposition_table=None,
+                 use_quiescence=True):
+        if algorithm not in ("alpha-beta", "minimax"):
+            raise ValueError(f"unknown algorithm: {algorithm}")
+        self.core = MiniChess()
+        self.core.algorithm = algorithm == "alpha-beta"
+        self.core.heuristic = heuristic
+        self.core.move_generator = move_generator
+        self.core.use_quiescence = use_quiescence
+        if transposition_table is not None:
+            self.core.transposition_table = transposition_table
+
+    """
+    Searches a position. Alpha-beta deepens iteratively until depth or time_limit is reached, minimax searches exactly
+    depth plies, or deepens iteratively until time_limit when no depth is given. Both algorithms stop at time_limit.
+
+    Args:
+        - position: Position or dictionary | the position to search, it is not modified
+        - depth: int | maximum depth (alpha-beta) or search depth (minimax), None = until time_limit
+        - time_limit: float | seconds the search may take with either algorithm (a fixed-depth minimax search cut short
+          returns the best move found so far), None = until depth is reached
+        - turn_counter: int | the current turn of the game
+        - turn_with_piece_taken: int | the last turn a piece was taken, with turn_counter it gives the turns left before
+          the no-capture draw (used by the tablebases)
+    Returns:
+        - SearchResult | move and pv in chess notation ("B2 B3"), score from white's point of view like evaluate_board,
+          nodes explored, and stats with the completed depth, the elapsed time, the nodes per depth and the
+          SearchMetrics of the search
+    """
+    def search(self, position, depth=None, time_limit=None, turn_counter=1, turn_with_piece_taken=1):
+        core = self.core
+        if depth is None and time_limit is None:
+            raise ValueError("the search needs a depth or a time_limit")
+        if isinstance(position, Position):
+            game_state = position.to_game_state()
+        else:
+            game_state = {"board": [row[:] for row in position["board"]], "turn": position["turn"]}
+        core.depth = depth if depth is not None or not core.algorithm else 1
+        core.max_depth = depth if depth is not None else MAX_SEARCH_DEPTH
+        core.AI_time_out = time_limit if time_limit is not None else math.inf
+        core.turn_counter = turn_counter
+        core.turn_with_piece_taken = turn_with_piece_taken
+        core.total_states_explored = 0
+        core.depth_exploration_stats = {}
+        core.principal_variation = []
+
+        move, elapsed, score = core.AI_makeMove(game_state, game_state["turn"])
+        pv = [core.unparse_input(pv_move) for pv_move in core.principal_variation]
+        stats = {"depth": core.completed_depth if core.algorithm or depth is None else depth, "time": elapsed,
+                 "depth_exploration_stats": dict(core.depth_exploration_stats), "metrics": core.metrics.to_dict()}
+        return SearchResult(' '.join(core.unparse_input(move)) if move is not None else None, score,
+                            core.total_states_explored, [' '.join(pv_move) for pv_move in pv], stats)
+
+    """
+    Releases the search processes and shared memory held by the engine (see MiniChess.close)
+    """
+    def close(self):
+        self.core.close()
+
+class EngineProtocol:
+    """
+    Line-based engine protocol modelled on UCI, so one long-running process can serve many games over pipes and keep
+    its transposition table between searches. Moves are written as "b2b3". Commands:
+        uci | isready | ucinewgame | quit
+        setoption name Heuristic|Algorithm|Quiescence|Hash value <value>
+        position startpos|board <row 5>/<row 4>/<row 3>/<row 2>/<row 1> w|b [moves <move> ...]
+            (rows list 5 comma-separated squares, e.g. bK,bQ,bB,bN,.)
+        go [depth <plies>] [movetime <ms>] [infinite]
+        stop
+    Searches run in a background thread so stop and isready are answered while searching; other commands wait for the
+    search to finish. A search answers with info lines after every iteration (depth, score, nodes, nps, time, pv) and
+    a final bestmove line.
+    """
+
+    def __init__(self, input_stream, output_stream):
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.output_lock = threading.Lock()
+        self.engine = Engine()
+        self.stop_flag = multiprocessing.RawValue("b", 0)
+        self.engine.core.stop_flag = self.stop_flag
+        self.engine.core.iteration_callback = self.send_info
+        self.game_state = self.engine.core.init_board()
+        self.turn_counter = 1 # turn of the position, counted while replaying its moves
+        self.turn_with_piece_taken = 1 # last turn of the replayed moves with a capture
+        self.search_thread = None
+        self.search_start = 0.0
+
+    def send(self, line):
+        with self.output_lock:
+            self.output_stream.write(line + "\n")
+            self.output_stream.flush()
+
+    """
+    Converts an encoded move to protocol notation ("b2b3")
+
+    Args:
+        - move: int | the encoded move
+    Returns:
+        - string | the move in protocol notation
+    """
+    def format_move(self, move):
+        return ''.join(self.engine.core.unparse_input(move)).lower()
+
+    """
+    Reads commands until quit or the end of the input stream
+    """
+    def run(self):
+        for line in self.input_stream:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "quit":
+                break
+            self.handle(tokens)
+        self.stop_search()
+
+    """
+    Executes one command
+
+    Args:
+        - tokens: list | the words of the command line
+    Returns:
+        - None
+    """
+    def handle(self, tokens):
+        command = tokens[0]
+        if command == "uci":
+            self.send("id name MiniChess")
+            self.send("option name Heuristic type spin default 2 min 0 max 2")
+            self.send("option name Algorithm type combo default alpha-beta var alpha-beta var minimax")
+            self.send("option name Quiescence type check default true")
+            self.send("option name Hash type spin default 0 min 0 max 4096")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.wait_search()
+            core = self.engine.core
+            core.transposition_table.clear()
+            core.history = {}
+            self.game_state = core.init_board()
+            self.turn_counter = self.turn_with_piece_taken = 1
+        elif command == "setoption":
+            self.wait_search()
+            self.set_option(tokens)
+        elif command == "position":
+            self.wait_search()
+            self.set_position(tokens)
+        elif command == "go":
+            self.wait_search()
+            self.start_search(tokens)
+        elif command == "stop":
+            self.stop_search()
+        else:
+            self.send("info string unknown command: " + command)
+
+    def set_option(self, tokens):
+        if "name" not in tokens or "value" not in tokens:
+            self.send("info string usage: setoption name <name> value <value>")
+            return
+        name = ' '.join(tokens[tokens.index("name") + 1:tokens.index("value")]).lower()
+        value = ' '.join(tokens[tokens.index("value") + 1:])
+        core = self.engine.core
+        if name == "heuristic" and value in ("0", "1", "2"):
+            core.heuristic = int(value)
+        elif name == "algorithm" and value in ("alpha-beta", "minimax"):
+            core.algorithm = value == "alpha-beta"
+        elif name == "quiescence" and value in ("true", "false"):
+            core.use_quiescence = value == "true"
+        elif name == "hash" and value.isdigit():
+            core.transposition_table = TranspositionTable(megabytes=int(value)) if int(value) else TranspositionTable()
+        else:
+            self.send(f"info string invalid option: {name} = {value}")
+
+    def set_position(self, tokens):
+        core = self.engine.core
+        moves = tokens.index("moves") + 1 if "moves" in tokens else len(tokens)
+        if len(tokens) > 1 and tokens[1] == "startpos":
+            game_state = core.init_board()
+        elif len(tokens) > 3 and tokens[1] == "board" and tokens[3] in ("w", "b"):
+            board = [row.split(",") for row in tokens[2].split("/")]
+            if len(board) != 5 or any(len(row) != 5 or any(square not in PIECE_CODES for square in row) for row in board):
+                self.send("info string invalid board: " + tokens[2])
+                return
+            game_state = core.refresh_game_state({"board": board, "turn": "white" if tokens[3] == "w" else "black"})
+        else:
+            self.send("info string usage: position startpos|board <rows> w|b [moves ...]")
+            return
+        #Count the turns like the game loop so the search knows how far the no-capture draw is
+        turn_counter = turn_with_piece_taken = 1
+        for move in tokens[moves:]:
+            parsed = core.parse_input(move[:2] + " " + move[2:]) if len(move) == 4 else None
+            if parsed is None or not core.is_valid_move(game_state, parsed):
+                self.send("info string illegal move: " + move)
+                return
+            end_row, end_col = parsed[1]
+            if game_state["board"][end_row][end_col] != ".":
+                turn_with_piece_taken = turn_counter
+            core.simulate_make_move(game_state, core.encode_move(game_state, parsed))
+            if game_state["turn"] == "white":
+                turn_counter += 1
+        self.game_state = game_state
+        self.turn_counter = turn_counter
+        self.turn_with_piece_taken = turn_with_piece_taken
+
+    def start_search(self, tokens):
+        depth = None
+        time_limit = None
+        for name, value in zip(tokens[1:], tokens[2:]):
+            if name == "depth" and value.isdigit():
+                depth = int(value)
+            elif name == "movetime" and value.isdigit():
+                time_limit = int(value) / 1000
+        if depth is None and time_limit is None:
+            time_limit = math.inf # infinite: deepen until stop
+        self.stop_flag.value = 0
+        self.search_start = time.perf_counter()
+        self.search_thread = threading.Thread(target=self.search, args=(self.game_state, depth, time_limit), daemon=True)
+        self.search_thread.start()
+
+    def search(self, game_state, depth, time_limit):
+        #A GUI waits for bestmove: always send one, even when the search fails
+        try:
+            result = self.engine.search(game_state, depth, time_limit, self.turn_counter, self.turn_with_piece_taken)
+        except Exception as error:
+            self.send(f"info string search failed: {error!r}")
+            self.send("bestmove (none)")
+            return
+        if not self.engine.core.algorithm and depth is not None:
+            #A fixed-depth minimax search has no iterations to report
+            self.send(f"info depth {depth} nodes {result.nodes} time {int(result.stats['time'] * 1000)}")
+        self.send("bestmove " + (result.move.replace(" ", "").lower() if result.move else "(none)"))
+
+    """
+    Waits for the running search, if any, to send its bestmove line
+    """
+    def wait_search(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    """
+    Interrupts the running search, if any, and waits for its bestmove line
+    """
+    def stop_search(self):
+        self.stop_flag.value = 1
+        self.wait_search()
+
+    """
+    iteration_callback of the engine: reports a completed iteration as an info line
+    """
+    def send_info(self, depth, best_move, best_value):
+        core = self.engine.core
+        elapsed = time.perf_counter() - self.search_start
+        nodes = core.total_states_explored
+        self.send(f"info depth {depth} score cp {int(round(best_value * 100))} nodes {nodes} "
+                  f"nps {int(nodes / elapsed) if elapsed > 0 else 0} time {int(elapsed * 1000)} "
+                  f"pv {' '.join(self.format_move(move) for move in core.principal_variation)}")
+
+"""
+Searches one opening book position in a worker process
+
+Args:
+    - game_state: dictionary | Dictionary representing the position
+    - heuristic: int | heuristic the entry is computed for
+    - algorithm: string | "alpha-beta" or "minimax"
+    - depth: int | maximum depth of the search
+    - time_limit: float | seconds the search may take, None = until depth is reached
+Returns:
+    - tuple | (book key, encoded best move, negamax score), or None when the position has no move
+"""
+def search_book_position(game_state, heuristic, algorithm, depth, time_limit):
+    engine = Engine(heuristic=heuristic, algorithm=algorithm)
+    core = engine.core
+    result = engine.search(game_state, depth, time_limit)
+    if result.move is None:
+        return None
+    core.refresh_game_state(game_state)
+    move = core.encode_move(game_state, core.parse_input(result.move))
+    return (game_state["hash"] ^ ZOBRIST_HEURISTIC[heuristic], move,
+            result.score if game_state["turn"] == "white" else -result.score)
+
+"""
+Builds an opening book: every position reachable in the first plies from init_board is searched deeply for every
+heuristic over a process pool, and the results are written with OpeningBook.write
+
+Args:
+    - filename: string | the book file to write
+    - plies: int | positions up to this many plies from the initial board are searched
+    - depth: int | maximum depth of every search
+    - time_limit: float | seconds per search, None = until depth is reached
+    - heuristics: tuple | heuristics to compute entries for
+    - algorithm: string | "alpha-beta" or "minimax", recorded in the book so only that algorithm plays its moves
+    - jobs: int | number of worker processes, None = one per CPU
+Returns:
+    - int | number of entries written
+"""
+def build_opening_book(filename, plies, depth, time_limit=None, heuristics=(0, 1, 2), algorithm="alpha-beta", jobs=None):
+    engine = MiniChess()
+    level = [engine.init_board()]
+    positions = {level[0]["hash"]: level[0]}
+    for _ in range(plies):
+        next_level = []
+        for game_state in level:
+            for move in engine.generate_moves(game_state):
+                original_piece, captured_piece, game_state = engine.simulate_make_move(game_state, move)
+                if None not in game_state["kings"] and game_state["hash"] not in positions:
+                    child = engine.refresh_game_state({"board": [row[:] for row in game_state["board"]],
+                                                       "turn": game_state["turn"]})
+                    positions[child["hash"]] = child
+                    next_level.append(child)
+                engine.simulate_unmake_move(game_state, move, captured_piece, original_piece)
+        level = next_level
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(search_book_position, {"board": game_state["board"], "turn": game_state["turn"]},
+                               heuristic, algorithm, depth, time_limit)
+                   for game_state in positions.values() for heuristic in heuristics]
+        entries = [entry for entry in (future.result() for future in futures) if entry is not None]
+    OpeningBook.write(filename, entries, algorithm)
+    return len(entries)
+
+#Game records: one JSON line per game, appended to a single file. The moves are packed as little-endian uint16
+#encoded moves and the per-move search stats as GAME_RECORD_STATS entries (search time, nodes, completed depth and
+#score from white's point of view; zero for moves that were not searched), both base64 encoded
+GAME_RECORD_STATS = struct.Struct("<fIBf")
+
+"""
+Builds the JSON line of a game record
+
+Args:
+    - params: dictionary | game parameters (players, max_turns, seed, ...)
+    - result: dictionary | game outcome (winner, reason, turns, ...)
+    - moves: list | encoded moves of the game, in order
+    - move_stats: list | (time, nodes, depth, score) of every move
+Returns:
+    - string | the record, newline included
+"""
+def encode_game_record(params, result, moves, move_stats):
+    stats = b''.join(GAME_RECORD_STATS.pack(*entry) for entry in move_stats)
+    return json.dumps({"params": params, "result": result,
+                       "moves": base64.b64encode(array.array("H", moves).tobytes()).decode("ascii"),
+                       "stats": base64.b64encode(stats).decode("ascii")}, separators=(",", ":")) + "\n"
+
+"""
+Decodes one line written by encode_game_record
+
+Args:
+    - line: string | the JSON line
+Returns:
+    - dictionary | "params", "result", "moves" (list of encoded moves) and "stats" (list of (time, nodes, depth, score))
+"""
+def decode_game_record(line):
+    record = json.loads(line)
+    moves = array.array("H")
+    moves.frombytes(base64.b64decode(record["moves"]))
+    record["moves"] = moves.tolist()
+    record["stats"] = list(GAME_RECORD_STATS.iter_unpack(base64.b64decode(record["stats"])))
+    return record
+
+"""
+Streams the games of a record file one at a time, without loading the file
+
+Args:
+    - filename: string | the record file
+Returns:
+    - generator | the decoded records, see decode_game_record
+"""
+def read_game_records(filename):
+    with open(filename) as file:
+        for line in file:
+            if line.strip():
+                yield decode_game_record(line)
+
+"""
+Parses a tournament player given as ALGORITHM:HEURISTIC:DEPTH:TIMEOUT, e.g. "a:2:50:0.5" for alpha-beta with heuristic 2,
+at most 50 plies deep and 0.5 seconds per move. For minimax the depth is the fixed search depth.
+
+Args:
+    - spec: string | the player specification
+Returns:
+    - dictionary | {"algorithm", "heuristic", "depth", "timeout"}
+"""
+def parse_player_spec(spec):
+    algorithm, heuristic, depth, timeout = spec.split(":")
+    if algorithm not in ("a", "m") or int(heuristic) not in (0, 1, 2):
+        raise ValueError(f"invalid player specification: {spec}")
+    return {"algorithm": algorithm, "heuristic": int(heuristic), "depth": int(depth), "timeout": float(timeout)}
+
+"""
+Plays one AI vs AI game without prompts, console output or trace file, with the rules of ai_vs_ai: a king capture
+wins, DRAW_TURNS_WITHOUT_CAPTURE turns without a capture or reaching max_turns is a draw, and an AI that plays an
+invalid move or exceeds its timeout loses. The first opening_plies plies are random moves (king captures excluded)
+so that the games of a tournament do not all repeat the same deterministic line. Each side has its own engine.
+
+Args:
+    - white: dictionary | white player, as returned by parse_player_spec
+    - black: dictionary | black player, as returned by parse_player_spec
+    - max_turns: int | maximum number of turns before the game ends
+    - opening_plies: int | number of random plies played before the AIs take over
+    - seed: int | seed of the random opening
+Returns:
+    - dictionary | winner ("white", "black" or None), reason, turns, plies, per side the search time, the slowest
+      move and the nodes explored, and the moves played with their search stats
+"""
+def play_tournament_game(white, black, max_turns, opening_plies, seed):
+    players = {"white": white, "black": black}
+    engines = {}
+    for color, player in players.items():
+        engine = MiniChess()
+        engine.players = {"white": "AI", "black": "AI"}
+        engine.algorithm = player["algorithm"] == "a"
+        engine.heuristic = player["heuristic"]
+        engine.depth = player["depth"]
+        engine.max_depth = player["depth"]
+        engine.AI_time_out = search_time_budget(player["timeout"])
+        engine.total_states_explored = 0
+        engine.depth_exploration_stats = {}
+        engines[color] = engine
+    stats = {color: {"time": 0.0, "max_time": 0.0, "nodes": 0, "moves": 0} for color in players}
+    moves = []
+    move_stats = []
+    opening = random.Random(seed)
+    game_state = engines["white"].init_board()
+    turn_counter = 1
+    turn_with_piece_taken = 1
+    plies = 0
+    winner, reason = None, "turn limit"
+    while turn_counter <= max_turns:
+        if turn_counter - turn_with_piece_taken >= DRAW_TURNS_WITHOUT_CAPTURE:
+            reason = "no capture"
+            break
+        color = game_state["turn"]
+        opponent = "black" if color == "white" else "white"
+        engine = engines[color]
+        if plies < opening_plies:
+            board = game_state["board"]
+            candidates = [move for move in engine.generate_moves(game_state)
+                          if board[(move & MOVE_SQUARES) % 25 // 5][(move & MOVE_SQUARES) % 5][1:] != "K"]
+            move = opening.choice(candidates)
+            move_stats.append((0.0, 0, 0, 0.0))
+        else:
+            nodes = engine.total_states_explored
+            engine.turn_counter = turn_counter
+            engine.turn_with_piece_taken = turn_with_piece_taken
+            decoded, eval_time, score = engine.AI_makeMove(game_state, color)
+            move_stats.append((eval_time, engine.total_states_explored - nodes, engine.completed_depth, score))
+            side = stats[color]
+            side["time"] += eval_time
+            side["max_time"] = max(side["max_time"], eval_time)
+            side["nodes"] += engine.total_states_explored - nodes
+            side["moves"] += 1
+            if decoded is None or not engine.is_valid_move(game_state, decoded):
+                winner, reason = opponent, "invalid move"
+                break
+            if eval_time > players[color]["timeout"]:
+                winner, reason = opponent, "timeout"
+                break
+            move = engine.encode_move(game_state, decoded)
+        end_row, end_col = SQUARE_COORDS[(move & MOVE_SQUARES) % 25]
+        captured = game_state["board"][end_row][end_col]
+        if captured != ".":
+            turn_with_piece_taken = turn_counter
+        engine.simulate_make_move(game_state, move)
+        moves.append(move)
+        plies += 1
+        if game_state["turn"] == "white":
+            turn_counter += 1
+        if captured[1:] == "K":
+            winner, reason = color, "king captured"
+            break
+    return {"winner": winner, "reason": reason, "turns": turn_counter - 1, "plies": plies, "stats": stats,
+            "moves": moves, "move_stats": move_stats[:len(moves)]}
+
+"""
+Plays AI vs AI games of every pairing concurrently over a process pool and aggregates the results
+
+Args:
+    - pairings: list | (white, black) player specifications, see parse_player_spec
+    - games: int | number of games per pairing
+    - max_turns: int | maximum number of turns of each game
+    - opening_plies: int | random plies at the start of each game
+    - jobs: int | number of worker processes, None = one per CPU
+    - swap_colors: bool | also play every pairing with the colors reversed
+    - seed: int | seed of the first game, game i uses seed + i
+    - records: string | file every game is appended to as a game record (see encode_game_record), None = no records
+Returns:
+    - list | one summary dictionary per pairing: players, wins of each player, draws, end reasons and timings
+"""
+def run_tournament(pairings, games, max_turns, opening_plies=2, jobs=None, swap_colors=False, seed=0, records=None):
+    if swap_colors:
+        pairings = pairings + [(black, white) for white, black in pairings]
+    players = [(parse_player_spec(white), parse_player_spec(black)) for white, black in pairings]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [[pool.submit(play_tournament_game, white, black, max_turns, opening_plies, seed + index * games + game)
+                    for game in range(games)] for index, (white, black) in enumerate(players)]
+        results = [[future.result() for future in pairing_futures] for pairing_futures in futures]
+    if records is not None:
+        with open(records, "a") as file:
+            for index, ((white_spec, black_spec), pairing_results) in enumerate(zip(pairings, results)):
+                for game, result in enumerate(pairing_results):
+                    params = {"white": white_spec, "black": black_spec, "max_turns": max_turns,
+                              "opening_plies": opening_plies, "seed": seed + index * games + game}
+                    outcome = {"winner": result["winner"], "reason": result["reason"], "turns": result["turns"]}
+                    file.write(encode_game_record(params, outcome, result["moves"], result["move_stats"]))
+    wall_time = time.perf_counter() - start
+
+    summaries = []
+    for (white_spec, black_spec), pairing_results in zip(pairings, results):
+        summary = {"white": white_spec, "black": black_spec, "games": len(pairing_results),
+                   "white_wins": sum(result["winner"] == "white" for result in pairing_results),
+                   "black_wins": sum(result["winner"] == "black" for result in pairing_results),
+                   "draws": sum(result["winner"] is None for result in pairing_results),
+                   "reasons": {},
+                   "average_turns": sum(result["turns"] for result in pairing_results) / len(pairing_results),
+                   "wall_time": wall_time}
+        for result in pairing_results:
+            summary["reasons"][result["reason"]] = summary["reasons"].get(result["reason"], 0) + 1
+        for color in ("white", "black"):
+            moves = sum(result["stats"][color]["moves"] for result in pairing_results)
+            search_time = sum(result["stats"][color]["time"] for result in pairing_results)
+            nodes = sum(result["stats"][color]["nodes"] for result in pairing_results)
+            summary[color + "_timing"] = {
+                "moves": moves,
+                "average_move_time": search_time / moves if moves else 0.0,
+                "max_move_time": max(result["stats"][color]["max_time"] for result in pairing_results),
+                "nodes_per_second": nodes / search_time if search_time else 0.0}
+        summaries.append(summary)
+    return summaries
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mini Chess")
+    parser.add_argument("--perft", type=int, metavar="DEPTH", help="run perft from the initial board up to DEPTH and exit")
+    parser.add_argument("--divide", action="store_true", help="with --perft, also print the counts per root move")
+    parser.add_argument("--tt-mb", type=float, metavar="MB", help="memory budget of the alpha-beta transposition table")
+    parser.add_argument("--eval-cache", type=int, default=1 << 16, metavar="ENTRIES",
+                        help="positions kept by the evaluation cache of heuristics 1 and 2 (0 disables it)")
+    parser.add_argument("--move-generator", choices=["tables", "bitboard"], default="tables", help="move generator to use")
+    parser.add_argument("--workers", type=int, default=1, help="processes searching the root moves in parallel")
+    parser.add_argument("--smp", type=int, default=0, metavar="HELPERS", help="Lazy SMP helper processes searching alongside alpha-beta")
+    parser.add_argument("--book", metavar="FILE", help="opening book consulted by the AI before searching")
+    parser.add_argument("--build-book", metavar="FILE", help="build an opening book into FILE and exit")
+    parser.add_argument("--book-plies", type=int, default=4, help="with --build-book, plies from the initial board covered by the book")
+    parser.add_argument("--book-depth", type=int, default=8, help="with --build-book, maximum search depth of every book position")
+    parser.add_argument("--book-time", type=float, help="with --build-book, seconds per book position (default: no limit)")
+    parser.add_argument("--book-algorithm", choices=BOOK_ALGORITHMS, default="alpha-beta",
+                        help="with --build-book, search the book positions with this algorithm; only AIs using it play the book")
+    parser.add_argument("--tablebases", metavar="DIR", help="endgame tablebases probed by alpha-beta")
+    parser.add_argument("--build-tablebases", metavar="DIR", help="generate endgame tablebases into DIR and exit")
+    parser.add_argument("--signatures", nargs="+", default=["KQvK", "KvKQ", "KPvK", "KvKP", "KBvK", "KvKB", "KNvK", "KvKN"],
+                        help="with --build-tablebases, material signatures to generate (at most %d pieces)" % TABLEBASE_MAX_PIECES)
+    parser.add_argument("--metrics", metavar="FILE", help="append the metrics of every AI search to FILE as JSON lines")
+    parser.add_argument("--profile", action="store_true", help="time move generation, evaluation and search during the game and print a hot-path report at the end")
+    parser.add_argument("--profile-dump", metavar="FILE", help="with --profile, also record the game with cProfile and dump the pstats to FILE")
+    parser.add_argument("--protocol", action="store_true", help="serve the line-based engine protocol on stdin/stdout")
+    parser.add_argument("--tournament", nargs=2, action="append", metavar=("WHITE", "BLACK"),
+                        help="play a headless AI vs AI pairing, players given as ALGORITHM:HEURISTIC:DEPTH:TIMEOUT (e.g. a:2:50:0.5); repeatable")
+    parser.add_argument("--games", type=int, default=100, help="with --tournament, games per pairing")
+    parser.add_argument("--max-turns", type=int, default=100, help="with --tournament, maximum number of turns per game")
+    parser.add_argument("--opening-plies", type=int, default=2, help="with --tournament, random plies at the start of each game")
+    parser.add_argument("--swap-colors", action="store_true", help="with --tournament, also play every pairing with the colors reversed")
+    parser.add_argument("--jobs", type=int, help="with --tournament or --build-book, processes used (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="with --tournament, seed of the random openings")
+    parser.add_argument("--records", metavar="FILE", help="with --tournament, append a game record of every game to FILE")
+    parser.add_argument("--summary", default="tournament-summary.json", help="with --tournament, file receiving the JSON summary")
+    args = parser.parse_args()
     #Creating an instance of MiniChess
     game = MiniChess()
-    #Calling the play() method to initialize the game
-    game.play()
\ No newline at end of file
+    game.move_generator = args.move_generator
+    game.workers = args.workers
+    game.smp_helpers = args.smp
+    if args.tt_mb:
+        game.transposition_table = TranspositionTable(megabytes=args.tt_mb)
+    game.evaluation_cache = EvaluationCache(args.eval_cache) if args.eval_cache > 0 else None
+    if args.smp > 0:
+        game.transposition_table = SharedTranspositionTable(megabytes=args.tt_mb) if args.tt_mb else SharedTranspositionTable()
+    if args.perft:
+        exit(0 if game.perft_report(args.perft, split=args.divide) else 1)
+    if args.build_book:
+        entries = build_opening_book(args.build_book, args.book_plies, args.book_depth, args.book_time,
+                                     algorithm=args.book_algorithm, jobs=args.jobs)
+        print(f"{entries} book entries written to {args.build_book}")
+        exit(0)
+    if args.build_tablebases:
+        for name in generate_tablebases(args.build_tablebases, args.signatures):
+            print(f"{name} written to {args.build_tablebases}")
+        exit(0)
+    if args.tablebases:
+        game.tablebases = Tablebases(args.tablebases)
+    if args.metrics:
+        game.metrics_writer = TraceWriter(args.metrics)
+    if args.book:
+        game.opening_book = OpeningBook(args.book)
+    if args.protocol:
+        protocol = EngineProtocol(sys.stdin, sys.stdout)
+        protocol.engine.core.opening_book = game.opening_book
+        protocol.engine.core.tablebases = game.tablebases
+        protocol.engine.core.move_generator = args.move_generator
+        protocol.engine.core.transposition_table = game.transposition_table
+        try:
+            protocol.run()
+        finally:
+            protocol.engine.close()
+            game.close()
+        exit(0)
+    if args.tournament:
+        summaries = run_tournament(args.tournament, args.games, args.max_turns, args.opening_plies, args.jobs,
+                                   args.swap_colors, args.seed, args.records)
+        with open(args.summary, "w") as file:
+            json.dump(summaries, file, indent=2)
+        for summary in summaries:
+            print(f"{summary['white']} vs {summary['black']}: +{summary['white_wins']} ={summary['draws']} "
+                  f"-{summary['black_wins']} ({summary['games']} games, {summary['average_turns']:.1f} turns on average)")
+        exit(0)
+    #Calling the play() method to initialize the game, the game modes end with exit
+    try:
+        if args.profile:
+            profiler = Profiler(game, cprofile_file=args.profile_dump)
+            try:
+                with profiler:
+                    game.play()
+            finally:
+                print(profiler.report())
+                if args.profile_dump:
+                    pstats.Stats(args.profile_dump).sort_stats("cumulative").print_stats(15)
+        else:
+            game.play()
+    finally:
+        game.close()
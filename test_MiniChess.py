@@ -0,0 +1,113 @@
+import io
+import random
+import time
+
+import pytest
+
+from MiniChess import (ZOBRIST_HEURISTIC, Bitboards, Engine, EngineProtocol, MiniChess, OpeningBook, Position,
+                       parse_player_spec, play_tournament_game)
+
+#Time the search may take past its budget: unwinding, and the scheduling jitter of a loaded machine
+DEADLINE_MARGIN = 0.02
+
+
+@pytest.mark.parametrize("algorithm", [True, False], ids=["alpha-beta", "minimax"])
+def test_back_to_back_searches_stop_on_time(algorithm):
+    game = MiniChess()
+    game.algorithm = algorithm
+    game.depth = 8
+    game_state = game.current_game_state
+    #A long search first: nothing it measured may delay the clock reads of the next ones
+    game.AI_time_out = 0.5
+    game.AI_makeMove(game_state, game_state["turn"])
+    for _ in range(2):
+        game.AI_time_out = 0.05
+        start = time.perf_counter()
+        move = game.AI_makeMove(game_state, game_state["turn"])[0]
+        assert time.perf_counter() - start < game.AI_time_out + DEADLINE_MARGIN
+        assert move is not None
+        game.make_move(game_state, move)
+
+
+def test_incremental_bitboards_match_the_board():
+    tables, bitboard = MiniChess(), MiniChess()
+    bitboard.move_generator = "bitboard"
+    rng = random.Random(0)
+    for _ in range(20):
+        table_state, bitboard_state = tables.init_board(), bitboard.init_board()
+        for _ in range(40):
+            moves = sorted(tables.generate_moves(table_state))
+            assert sorted(bitboard.generate_moves(bitboard_state)) == moves
+            assert bitboard.count_mobility(bitboard_state) == tables.count_mobility(table_state)
+            kept, fresh = bitboard_state["bitboards"], Bitboards(Position.from_game_state(bitboard_state))
+            assert (kept.pieces, kept.colors, kept.occupied, kept.turn) == (fresh.pieces, fresh.colors, fresh.occupied, fresh.turn)
+            if not moves or None in table_state["kings"]:
+                break
+            move = rng.choice(moves)
+            tables.simulate_make_move(table_state, move)
+            bitboard.simulate_make_move(bitboard_state, move)
+
+
+def test_engine_time_limit_stops_fixed_depth_minimax():
+    engine = Engine(algorithm="minimax")
+    try:
+        result = engine.search(MiniChess().init_board(), depth=6, time_limit=0.05)
+    finally:
+        engine.close()
+    assert result.move is not None
+    assert result.stats["time"] < 0.05 + DEADLINE_MARGIN
+
+
+def run_protocol(*commands):
+    output = io.StringIO()
+    protocol = EngineProtocol(io.StringIO(), output)
+    for command in commands:
+        protocol.handle(command.split())
+    protocol.wait_search()
+    return output.getvalue().splitlines()
+
+
+@pytest.mark.parametrize("algorithm", ["alpha-beta", "minimax"])
+def test_protocol_movetime_answers_bestmove(algorithm):
+    lines = run_protocol(f"setoption name Algorithm value {algorithm}", "position startpos", "go movetime 50")
+    assert [line for line in lines if line.startswith("info depth")]
+    assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove (none)"
+
+
+@pytest.mark.parametrize("white,black", [("a:2:50:0.1", "m:2:4:0.1"), ("m:2:4:0.1", "a:2:50:0.1")])
+def test_budgeted_ai_moves_never_forfeit_on_time(white, black):
+    for seed in range(2):
+        game = play_tournament_game(parse_player_spec(white), parse_player_spec(black), 20, 2, seed)
+        assert game["reason"] != "timeout"
+        for side in game["stats"].values():
+            assert side["max_time"] <= 0.1
+
+
+def test_first_move_cutoff_rate_counts_main_search_cutoffs_only():
+    game = MiniChess()
+    game.algorithm = True
+    game.AI_time_out = 0.3
+    game.AI_makeMove(game.current_game_state, game.current_game_state["turn"])
+    metrics = game.metrics.to_dict()
+    assert metrics["qsearch_cutoffs"] > 0
+    assert 0 < metrics["first_move_cutoffs"] <= metrics["cutoffs"]
+    assert metrics["first_move_cutoff_rate"] == metrics["first_move_cutoffs"] / metrics["cutoffs"]
+
+
+def test_opening_book_keeps_scores_and_serves_only_its_algorithm(tmp_path):
+    filename = str(tmp_path / "book.bin")
+    game = MiniChess()
+    game_state = game.current_game_state
+    key = game_state["hash"] ^ ZOBRIST_HEURISTIC[game.heuristic]
+    move = game.generate_moves(game_state)[0]
+    OpeningBook.write(filename, [(key, move, 0.1)], "alpha-beta")
+    game.opening_book = OpeningBook(filename)
+    try:
+        assert game.opening_book.algorithm == "alpha-beta"
+        assert game.opening_book.probe(key) == (move, 0.1)
+        game.algorithm = True
+        assert game.probe_opening_book(game_state) == (move, 0.1)
+        game.algorithm = False
+        assert game.probe_opening_book(game_state) is None
+    finally:
+        game.opening_book.close()